@@ -1,25 +1,139 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from config import TARGET_ALTITUDE_DEG
-from hengefinder import search_for_henge
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context, redirect, g
+from config import TARGET_ALTITUDE_DEG, SEARCH_MODE, STREET_INDEX_MAX_RESULTS, BATCH_MAX_ITEMS, BATCH_MAX_ADDRESSES, DEMO_ADDRESS, DEMO_COORDINATES, DEMO_ROAD_BEARING, SOLAR_HTTP_MAX_AGE_SECONDS, SOLAR_DATA_VERSION, SUN_CURVE_MAX_SAMPLES, JOB_MAX_WAIT_SECONDS, JOB_RETRY_AFTER_SECONDS, HENGE_FEED_DEFAULT_YEARS
+from hengefinder import search_for_henge, iter_henges, search_flight, henge_result_cache
 import datetime
-from utils import get_location, get_coordinates, get_standardized_address, get_concise_address, get_road_bearing, GeocodingError, check_latitude, get_utc_start_date, normalize_bearing_to_180_360
+from utils import geocode_cache, geocode_failure_cache, geocode_flight, road_bearing_flight, get_location, get_coordinates, get_standardized_address, get_concise_address, get_road_bearing, get_timezone_from_coordinates, GeocodingError, check_latitude, get_utc_start_date, normalize_bearing_to_180_360
+from pipeline import run_stages, StageError
+from timezones import get_timezone_resolver
+from jobs import get_job_queue, QueueFull
+from calendar_feed import henge_calendar
+from itertools import islice
+from metrics import collect_timings, stop_collecting, server_timing_header, record_request, render_prometheus
 import traceback
 from astral import Observer, sun
-from sunset_calculator import calculate_sun_azimuths_for_year
+from solar import sun_position
+from sunset_calculator import calculate_sun_azimuths_for_year, pack_sun_azimuths, azimuth_cache, azimuth_flight, SUN_ANGLE_FORMATS
 from zoneinfo import ZoneInfo
+from urllib.parse import urlencode
+import hashlib
 import os
+import time
 
 
 app = Flask(__name__)
 
-def make_observer():
-    address = "251 W 42nd St, New York, NY"  # Fixed Manhattan address for demonstration
-    # Get coordinates for the fixed address
-    location = get_location(address)
-    lat, lon = get_coordinates(location)
-    return Observer(lat, lon)
+_demo_observer = None
 
-demo_observer = make_observer()
+
+@app.before_request
+def start_timing():
+    g.request_start = time.perf_counter()
+    g.timings, g.timings_token = collect_timings()
+
+
+@app.after_request
+def add_server_timing(response):
+    """Report the stage timings of this request in a Server-Timing header, and record it in /metrics"""
+    if 'request_start' in g:
+        elapsed = time.perf_counter() - g.request_start
+        response.headers['Server-Timing'] = server_timing_header(g.timings, total=elapsed)
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(f"{request.method} {endpoint}", response.status_code, elapsed)
+    return response
+
+
+@app.teardown_request
+def stop_timing(exc):
+    # Popped so the token is reset once: stream_with_context pushes the request context
+    # again while the body streams, and teardown runs on each pop
+    token = g.pop('timings_token', None)
+    if token is not None:
+        stop_collecting(token)
+
+
+def get_demo_observer():
+    """
+    Observer for the demo animation, created on first use.
+
+    Uses the fixed DEMO_COORDINATES so starting the app never needs the network;
+    only geocodes DEMO_ADDRESS if they're not configured.
+    """
+    global _demo_observer
+    if _demo_observer is None:
+        if DEMO_COORDINATES is not None:
+            lat, lon = DEMO_COORDINATES
+        else:
+            location = get_location(DEMO_ADDRESS)
+            lat, lon = get_coordinates(location)
+        _demo_observer = Observer(lat, lon)
+    return _demo_observer
+
+
+def demo_sun_position(exact_time):
+    """Sun position for the demo animation, relative to the demo street"""
+    demo_observer = get_demo_observer()
+    return {
+        'graphic_az': sun.azimuth(demo_observer, exact_time) - DEMO_ROAD_BEARING,
+        'altitude': sun.elevation(demo_observer, exact_time),
+    }
+
+
+def sun_curve_payload(lat, lon, road_bearing, start, minutes, step_minutes):
+    """Sun altitude and road-relative azimuth every step_minutes for minutes from start"""
+    offsets = list(range(0, minutes + 1, step_minutes))
+    epochs = [start.timestamp() + offset * 60 for offset in offsets]
+    altitude, azimuth = sun_position(lat, lon, epochs)
+    return {
+        'start': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'step_minutes': step_minutes,
+        'road_bearing': road_bearing,
+        'graphic_az': [round(float(az) - road_bearing, 3) for az in azimuth],
+        'altitude': [round(float(alt), 3) for alt in altitude],
+    }
+
+
+def sun_angles_payload(lat, lon, start_date_obj, time_of_day, target_altitude_deg, response_format='objects'):
+    """Sun azimuths for a year from start_date_obj, in the shape /lookup_sun_angles returns them"""
+    # Calculate end date (one year later)
+    end_date_obj = datetime.datetime(start_date_obj.year + 1, start_date_obj.month, start_date_obj.day).date()
+
+    result = calculate_sun_azimuths_for_year(lat, lon, start_date=start_date_obj, target_altitude_deg=target_altitude_deg, time_of_day=time_of_day)
+    if response_format != 'objects':
+        result = pack_sun_azimuths(result, start_date_obj, response_format)
+
+    return {
+        'coordinates': {'lat': lat, 'lon': lon},
+        'start_date': start_date_obj.isoformat(),
+        'end_date': end_date_obj.isoformat(),
+        'time_of_day': time_of_day,
+        'sun_angles': result
+    }
+
+
+def solar_data_response(canonical_params, compute, etag_extra=()):
+    """
+    Cacheable response for a GET solar data endpoint.
+
+    Requests whose query string isn't already canonical_params (in order) are
+    redirected to it, so equivalent requests share one URL and one entry in
+    browser and proxy caches. The ETag only depends on the canonical query (and
+    SOLAR_DATA_VERSION), so conditional requests get a 304 without calling compute.
+    """
+    canonical_query = urlencode(canonical_params)
+    if request.query_string.decode() != canonical_query:
+        response = redirect(f"{request.path}?{canonical_query}", code=301)
+    else:
+        etag_source = [SOLAR_DATA_VERSION, request.path, canonical_query, *etag_extra]
+        etag = hashlib.sha1(app.json.dumps(etag_source).encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(compute())
+        response.set_etag(etag)
+
+    response.cache_control.public = True
+    response.cache_control.max_age = SOLAR_HTTP_MAX_AGE_SECONDS
+    return response
 
 
 @app.route('/')
@@ -36,7 +150,6 @@ def lookup_azimuth_altitude():
     try:
         data = request.get_json()
         time_str = data.get('time')
-        demo_road_bearing =299.5  # Default Manhattan bearing
         
         if not time_str:
             return jsonify({'error': 'Time parameter is required'}), 400
@@ -44,19 +157,93 @@ def lookup_azimuth_altitude():
         # Parse the time string
         exact_time = datetime.datetime.fromisoformat(time_str.replace('Z', '+00:00'))
         
-        graphic_az = sun.azimuth(demo_observer, exact_time) - demo_road_bearing 
-        alt = sun.elevation(demo_observer, exact_time)
-        
-        return jsonify({
-            'graphic_az': graphic_az,
-            'altitude': alt,
-        })
+        return jsonify(demo_sun_position(exact_time))
         
     except Exception as e:
         print(f"Unexpected error in lookup_azimuth_altitude: {e}")
         traceback.print_exc()
         return jsonify({'error': 'An unexpected error occurred while calculating sun position.'}), 500
 
+@app.route('/lookup_azimuth_altitude', methods=['GET'])
+def get_azimuth_altitude():
+    """
+    Cacheable GET variant of /lookup_azimuth_altitude.
+
+    The time is canonicalized to whole seconds in UTC (e.g. ?time=2026-06-28T20:15:00Z).
+    """
+    time_str = request.args.get('time')
+    if not time_str:
+        return jsonify({'error': 'Time parameter is required'}), 400
+    try:
+        exact_time = datetime.datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+    except ValueError:
+        return jsonify({'error': 'Invalid time format. Use ISO 8601, e.g. 2026-06-28T20:15:00Z.'}), 400
+
+    # Naive times are UTC, as in astral
+    if exact_time.tzinfo is None:
+        exact_time = exact_time.replace(tzinfo=datetime.timezone.utc)
+    exact_time = exact_time.astimezone(datetime.timezone.utc).replace(microsecond=0)
+
+    try:
+        return solar_data_response(
+            [('time', exact_time.strftime('%Y-%m-%dT%H:%M:%SZ'))],
+            lambda: demo_sun_position(exact_time),
+            etag_extra=(DEMO_COORDINATES or DEMO_ADDRESS,),
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_azimuth_altitude: {e}")
+        traceback.print_exc()
+        return jsonify({'error': 'An unexpected error occurred while calculating sun position.'}), 500
+
+@app.route('/lookup_sun_curve', methods=['GET'])
+def get_sun_curve():
+    """
+    Endpoint that returns the sun's altitude and road-relative azimuth over a stretch of time,
+    so a time slider can interpolate locally instead of requesting every position.
+
+    Query parameters: start (UTC, whole seconds, e.g. 2026-06-28T20:00:00Z), minutes, and
+    optionally step_minutes (default 1), lat, lon and road_bearing (default: the demo street).
+    """
+    try:
+        start = datetime.datetime.fromisoformat(request.args['start'].replace('Z', '+00:00'))
+        minutes = int(request.args['minutes'])
+        step_minutes = int(request.args.get('step_minutes', 1))
+        if 'lat' in request.args or 'lon' in request.args:
+            lat = round(float(request.args['lat']), 3)
+            lon = round(float(request.args['lon']), 3)
+        else:
+            demo_observer = get_demo_observer()
+            lat, lon = round(demo_observer.latitude, 3), round(demo_observer.longitude, 3)
+        road_bearing = float(request.args.get('road_bearing', DEMO_ROAD_BEARING))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid or missing parameter: {e}'}), 400
+
+    if minutes < 1 or step_minutes < 1 or minutes // step_minutes + 1 > SUN_CURVE_MAX_SAMPLES:
+        return jsonify({'error': f'minutes must be positive, step_minutes at least 1, and at most {SUN_CURVE_MAX_SAMPLES} samples requested'}), 400
+
+    # Naive times are UTC, as in astral
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=datetime.timezone.utc)
+    start = start.astimezone(datetime.timezone.utc).replace(microsecond=0)
+
+    canonical_params = [
+        ('start', start.strftime('%Y-%m-%dT%H:%M:%SZ')),
+        ('minutes', str(minutes)),
+        ('step_minutes', str(step_minutes)),
+        ('lat', repr(lat)),
+        ('lon', repr(lon)),
+        ('road_bearing', repr(road_bearing)),
+    ]
+    try:
+        return solar_data_response(
+            canonical_params,
+            lambda: sun_curve_payload(lat, lon, road_bearing, start, minutes, step_minutes),
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_sun_curve: {e}")
+        traceback.print_exc()
+        return jsonify({'error': 'An unexpected error occurred while calculating sun positions.'}), 500
+
 @app.route('/lookup_address', methods=['POST'])
 def lookup_address():
     """Endpoint that handles both address lookup and henge calculation"""
@@ -64,9 +251,12 @@ def lookup_address():
         data = request.get_json()
         address = data.get('address')
         user_road_bearing = data.get('road_bearing')  # Optional user-provided bearing
+        include_sunrise = data.get('include_sunrise', False)  # Optional: also report sunrise henges
         
         if not address:
             return jsonify({'error': 'Please enter an address to search for henge alignments.'}), 400
+        if not isinstance(include_sunrise, bool):
+            return jsonify({'error': 'include_sunrise must be true or false.'}), 400
 
 
 
@@ -76,7 +266,6 @@ def lookup_address():
             lat, lon = get_coordinates(location)
 
             standardized_address = get_standardized_address(location)
-            concise_address = get_concise_address(location)
             try:
                 check_latitude(lat)
             except ValueError as e:
@@ -90,31 +279,56 @@ def lookup_address():
             print(f"Unexpected error getting coordinates: {e}")
             return jsonify({'error': f'Error processing address: {str(e)}'}), 400
 
-        # Get road bearing (use user-provided if available, otherwise calculate)
-        try:
-            if user_road_bearing is not None:
+        # Validate the user-provided bearing before starting any lookups
+        if user_road_bearing is not None:
+            try:
                 road_bearing = float(user_road_bearing)
-                
+
                 # Normalize to 180-360 range
                 road_bearing = normalize_bearing_to_180_360(road_bearing)
-            else:
-                road_bearing = get_road_bearing(lat, lon)
-        except (ValueError, TypeError) as e:
-            print(f"Error with road bearing value: {e}")
-            return jsonify({
-                'error': "Invalid road bearing value provided. Please try adjusting the arrow again."
-            }), 400
-        except Exception as e:
-            print(f"Error getting road angle: {e}")
-            return jsonify({
-                'error': "Could not determine the street direction at this location. This might happen if the address is not near a mapped road, or if the road data is incomplete. Try using a different address on the same street."
-            }), 400
+            except (ValueError, TypeError) as e:
+                print(f"Error with road bearing value: {e}")
+                return jsonify({
+                    'error': "Invalid road bearing value provided. Please try adjusting the arrow again."
+                }), 400
+
+        # Everything else only needs the coordinates, so run it concurrently:
+        # the reverse geocode, the road bearing (unless the user gave one) and,
+        # if we're calculating the henge, the timezone
+        stages = {'concise_address': (get_concise_address, (location,))}
+        if user_road_bearing is None:
+            stages['road_bearing'] = (get_road_bearing, (lat, lon))
+        else:
+            stages['timezone'] = (get_timezone_from_coordinates, (lat, lon))
+
+        try:
+            stage_results, _ = run_stages(stages)
+        except StageError as e:
+            print(f"Error in lookup stage {e.stage}: {e.cause}")
+            if isinstance(e.cause, TimeoutError):
+                return jsonify({
+                    'error': 'Looking up this address took too long. Please try again.'
+                }), 504
+            if e.stage == 'concise_address':
+                if isinstance(e.cause, GeocodingError):
+                    return jsonify({
+                        'error': f"Could not find the address '{address}'. Please check the spelling and try again."
+                    }), 400
+                return jsonify({'error': f'Error processing address: {str(e.cause)}'}), 400
+            if e.stage == 'road_bearing':
+                return jsonify({
+                    'error': "Could not determine the street direction at this location. This might happen if the address is not near a mapped road, or if the road data is incomplete. Try using a different address on the same street."
+                }), 400
+            raise
+
+        concise_address = stage_results['concise_address']
 
         # If user provided a bearing, calculate henge; otherwise just return address info
         if user_road_bearing is not None:
             # Calculate henge
             start_date = get_utc_start_date()
-            result = search_for_henge(lat, lon, start_date, road_bearing=road_bearing)
+            mode = 'both' if include_sunrise else SEARCH_MODE
+            result = search_for_henge(lat, lon, start_date, road_bearing=road_bearing, mode=mode, tz=stage_results['timezone'])
             
             return jsonify({
                 'address': standardized_address,
@@ -124,6 +338,8 @@ def lookup_address():
                 'result': result
             })
         else:
+            road_bearing = stage_results['road_bearing']
+
             # Just return address info for initial display
             return jsonify({
                 'address': standardized_address,
@@ -149,10 +365,14 @@ def lookup_sun_angles():
         start_date = data.get('start_date')  # Optional: start date in YYYY-MM-DD format
         time_of_day = data.get('time_of_day', 'sunrise')  # Optional: default to sunrise
         target_altitude_deg = data.get('target_altitude_deg', TARGET_ALTITUDE_DEG) # Optional: default to 0.5 degrees
+        response_format = data.get('format', 'objects')  # Optional: "objects" (one per day), "columnar" or "binary"
         
         if not address:
             return jsonify({'error': 'Please enter an address to calculate sun angles.'}), 400
 
+        if response_format not in SUN_ANGLE_FORMATS:
+            return jsonify({'error': f'format must be one of {", ".join(SUN_ANGLE_FORMATS)}'}), 400
+
         # Validate time_of_day parameter
         if time_of_day not in ['sunrise', 'sunset']:
             return jsonify({'error': 'time_of_day must be either "sunrise" or "sunset"'}), 400
@@ -188,22 +408,12 @@ def lookup_sun_angles():
             current_year = datetime.now(ZoneInfo("UTC")).year
             start_date_obj = datetime(current_year, 1, 1).date()
 
-        # Calculate end date (one year later)
-        end_date_obj = datetime.datetime(start_date_obj.year + 1, start_date_obj.month, start_date_obj.day).date()
-
         # Calculate sun angles with henge detection
         try:
-            result = calculate_sun_azimuths_for_year(lat, lon, start_date=start_date_obj, target_altitude_deg=target_altitude_deg, time_of_day=time_of_day)
+            response_data = sun_angles_payload(lat, lon, start_date_obj, time_of_day, target_altitude_deg, response_format)
             
-            # Add address and coordinate info to response
-            response_data = {
-                'address': standardized_address,
-                'coordinates': {'lat': lat, 'lon': lon},
-                'start_date': start_date_obj.isoformat(),
-                'end_date': end_date_obj.isoformat(),
-                'time_of_day': time_of_day,
-                'sun_angles': result
-            }
+            # Add address info to response
+            response_data = {'address': standardized_address, **response_data}
             
             return jsonify(response_data)
             
@@ -222,5 +432,254 @@ def lookup_sun_angles():
         }), 500
 
 
+@app.route('/lookup_sun_angles', methods=['GET'])
+def get_sun_angles():
+    """
+    Cacheable GET variant of /lookup_sun_angles, by coordinates rather than address.
+
+    Query parameters: lat, lon (rounded to 3 decimal places), start_date (YYYY-MM-DD),
+    and optionally time_of_day, target_altitude_deg and format as in the POST endpoint.
+    """
+    try:
+        lat = round(float(request.args['lat']), 3)
+        lon = round(float(request.args['lon']), 3)
+        start_date_obj = datetime.datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        time_of_day = request.args.get('time_of_day', 'sunrise')
+        target_altitude_deg = float(request.args.get('target_altitude_deg', TARGET_ALTITUDE_DEG))
+        response_format = request.args.get('format', 'objects')
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid or missing parameter: {e}'}), 400
+
+    if time_of_day not in ['sunrise', 'sunset']:
+        return jsonify({'error': 'time_of_day must be either "sunrise" or "sunset"'}), 400
+    if response_format not in SUN_ANGLE_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(SUN_ANGLE_FORMATS)}'}), 400
+    try:
+        check_latitude(lat)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    canonical_params = [
+        ('lat', repr(lat)),
+        ('lon', repr(lon)),
+        ('start_date', start_date_obj.isoformat()),
+        ('time_of_day', time_of_day),
+        ('target_altitude_deg', repr(target_altitude_deg)),
+        ('format', response_format),
+    ]
+    try:
+        return solar_data_response(
+            canonical_params,
+            lambda: sun_angles_payload(lat, lon, start_date_obj, time_of_day, target_altitude_deg, response_format),
+        )
+    except Exception as e:
+        print(f"Error calculating sun angles: {e}")
+        traceback.print_exc()
+        return jsonify({
+            'error': f'An error occurred while calculating {time_of_day} angles. Please try again.'
+        }), 500
+
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Endpoint that reports hit/miss counters for the server-side caches"""
+    return jsonify({
+        'azimuth_curves': azimuth_cache.stats(),
+        'henge_results': henge_result_cache.stats(),
+        'geocode': geocode_cache.stats(),
+        'geocode_failures': geocode_failure_cache.stats(),
+        'timezones': get_timezone_resolver().stats(),
+        'singleflight': [flight.stats() for flight in (geocode_flight, road_bearing_flight, search_flight, azimuth_flight)],
+        'jobs': get_job_queue().stats(),
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Endpoint that exposes latency histograms, counters and cache hit rates in the Prometheus text format"""
+    caches = [azimuth_cache, henge_result_cache, geocode_cache, geocode_failure_cache, get_timezone_resolver()]
+    flights = [geocode_flight, road_bearing_flight, search_flight, azimuth_flight]
+    return Response(render_prometheus(caches, flights, get_job_queue()), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/aligned_streets', methods=['GET'])
+def aligned_streets():
+    """Endpoint that returns the streets of a city aligned with a sun azimuth, for map highlighting"""
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        azimuth = float(request.args['azimuth'])
+        tolerance = float(request.args.get('tolerance', 0.5))
+        min_length = float(request.args.get('min_length', 0))
+        max_length = float(request.args.get('max_length', 'inf'))
+        limit = min(int(request.args.get('limit', STREET_INDEX_MAX_RESULTS)), STREET_INDEX_MAX_RESULTS)
+        types = request.args['types'].split(',') if request.args.get('types') else None
+        bbox = None
+        if 'south' in request.args:
+            bbox = tuple(float(request.args[k]) for k in ('south', 'west', 'north', 'east'))
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid or missing parameter: {e}'}), 400
+
+    try:
+        # Imported lazily: building an index needs osmnx
+        from street_index import get_street_index
+
+        index = get_street_index(lat, lon)
+        matches, _ = index.query(azimuth, tolerance, bbox=bbox, min_length=min_length, max_length=max_length, types=types, limit=limit + 1)
+        return jsonify({
+            'total_streets': len(index),
+            'streets': [index.street(i) for i in matches[:limit]],
+            'truncated': len(matches) > limit,
+        })
+    except Exception as e:
+        print(f"Error looking up aligned streets: {e}")
+        traceback.print_exc()
+        return jsonify({'error': 'An error occurred while looking up aligned streets.'}), 500
+
+
+@app.route('/lookup_batch', methods=['POST'])
+def lookup_batch():
+    """
+    Endpoint that looks up henges for many addresses/coordinates at once.
+
+    Expects {"items": [{"address": ...} or {"lat": ..., "lon": ...}, optionally with "road_bearing"]}
+    and streams back one JSON object per line (NDJSON) as each lookup completes,
+    tagged with its "index" in items.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list of addresses or coordinates.'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} items can be looked up at once.'}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'Each item must be an object with an address or lat and lon.'}), 400
+    if sum(1 for item in items if item.get('address')) > BATCH_MAX_ADDRESSES:
+        # Geocoding is limited to one request per second, shared by every lookup
+        return jsonify({'error': f'At most {BATCH_MAX_ADDRESSES} items can be given by address at once; give lat and lon for the rest.'}), 400
+
+    # Imported lazily so the worker pool only starts when batches are used
+    from batch import lookup_henges
+
+    def generate():
+        for result in lookup_henges(items):
+            yield app.json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/henge_events', methods=['GET'])
+def henge_events():
+    """
+    Endpoint that streams the henges at a street in chronological order, without a fixed horizon.
+
+    Query: lat, lon, optional road_bearing (looked up if missing), start (YYYY-MM-DD, default today),
+    end (YYYY-MM-DD) and/or count, and format "ndjson" (default) or "ics". Without end or count,
+    NDJSON streams for as long as the client reads; an iCalendar feed covers HENGE_FEED_DEFAULT_YEARS.
+    """
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        check_latitude(lat)
+        start_date = get_utc_start_date()
+        if request.args.get('start'):
+            start_date = datetime.datetime.combine(datetime.date.fromisoformat(request.args['start']), datetime.time(), tzinfo=ZoneInfo("UTC"))
+        end_date = None
+        if request.args.get('end'):
+            end_date = datetime.datetime.combine(datetime.date.fromisoformat(request.args['end']), datetime.time(), tzinfo=ZoneInfo("UTC"))
+        limit = int(request.args['count']) if request.args.get('count') else None
+        if limit is not None and limit < 0:
+            raise ValueError("count must not be negative")
+        response_format = request.args.get('format', 'ndjson')
+        if response_format not in ('ndjson', 'ics'):
+            raise ValueError("format must be 'ndjson' or 'ics'")
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid or missing parameter: {e}'}), 400
+
+    try:
+        if request.args.get('road_bearing'):
+            road_bearing = normalize_bearing_to_180_360(float(request.args['road_bearing']))
+        else:
+            road_bearing = get_road_bearing(lat, lon)
+    except ValueError:
+        return jsonify({'error': 'Invalid road bearing value provided.'}), 400
+    except Exception as e:
+        print(f"Error getting road bearing: {e}")
+        return jsonify({'error': 'Could not determine the street direction at this location.'}), 500
+
+    if response_format == 'ics' and end_date is None and limit is None:
+        end_date = start_date + datetime.timedelta(days=round(365.25 * HENGE_FEED_DEFAULT_YEARS))
+    events = islice(iter_henges(lat, lon, road_bearing, start_date, end_date), limit)
+
+    if response_format == 'ics':
+        lines = henge_calendar(events, lat, lon, road_bearing, name=f"Henges at {lat:.4f}, {lon:.4f}")
+        return Response(stream_with_context(lines), mimetype='text/calendar')
+
+    def generate():
+        for event in events:
+            yield app.json.dumps(event) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Endpoint that queues a henge lookup and returns its job id straight away.
+
+    Expects {"address": ...} or {"lat": ..., "lon": ...}, optionally with "road_bearing"
+    (the same items as /lookup_batch). Responds 202 with the job id and the URL to poll,
+    or 429 with Retry-After if too many jobs are already pending.
+    """
+    item = request.get_json(silent=True)
+    if not isinstance(item, dict) or not (item.get('address') or ('lat' in item and 'lon' in item)):
+        return jsonify({'error': 'Expected an object with an address or lat and lon.'}), 400
+
+    try:
+        job = get_job_queue().submit(item)
+    except QueueFull:
+        response = jsonify({'error': 'Too many lookups are queued right now, please try again shortly.'})
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER_SECONDS)
+        return response, 429
+
+    poll_url = f'/jobs/{job.id}'
+    response = jsonify({**job.to_dict(), 'poll_url': poll_url})
+    response.headers['Location'] = poll_url
+    return response, 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Endpoint that reports a job's status, and its result once done.
+
+    With ?wait=<seconds> (at most JOB_MAX_WAIT_SECONDS), holds the request open until the
+    job finishes or the wait runs out, so clients can long-poll instead of polling rapidly.
+    """
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), JOB_MAX_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds.'}), 400
+
+    job = get_job_queue().get(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+
+    response = jsonify(job.to_dict())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def create_app(preload=True):
+    """
+    App factory for a production WSGI server (see serving.py): loads the shared data before the server forks its workers.
+    """
+    if preload:
+        from serving import preload_shared_data
+
+        print(f"Preloaded shared data: {preload_shared_data()}")
+    return app
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
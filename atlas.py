@@ -0,0 +1,225 @@
+"""
+Precomputed henge atlas: when does the sunset cross a bearing, at any latitude.
+
+The sunset azimuth only depends on the latitude and the sun's declination,
+and the declination moves monotonically between the solstices. So over the
+year from one December solstice to the next, the sunset azimuth at a latitude
+rises once and falls once, and crosses a given road bearing at most once on
+the way up and once on the way down. The atlas tabulates those two crossings
+for a grid of latitudes (within the +/-HENGE_ATLAS_MAX_LAT limit of
+check_latitude) and a grid of bearings, so the next henge can be looked up
+without any solar math.
+
+Longitude only shifts the time of day: the table is computed at longitude 0,
+with sunset times stored in local mean time (UTC at longitude 0), which is
+nearly the same at every longitude. Because the solstices fall on slightly
+different dates from year to year and the grids are interpolated, atlas dates
+can be off by a day or so; see hengefinder.search_atlas_for_henge for the
+exact refinement.
+
+The table is a float32 .npy file of shape (latitudes, bearings, 2, 2):
+    [..., slot, 0]  days after the December solstice (REFERENCE_START) of the crossing, NaN if none
+    [..., slot, 1]  local mean time of the sunset at the crossing, in minutes after midnight
+with slot 0 the crossing as the azimuth rises (towards the June solstice) and
+slot 1 as it falls. It is memory-mapped read-only, so every worker process
+shares the same pages. A JSON manifest next to it records the grids and the
+azimuth range at each latitude.
+
+Usage:
+    python scripts/build_henge_atlas.py
+"""
+import json
+import math
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from config import (
+    HENGE_ATLAS_PATH,
+    HENGE_ATLAS_MAX_LAT,
+    HENGE_ATLAS_LAT_STEP_DEG,
+    HENGE_ATLAS_BEARING_STEP_DEG,
+    HENGE_ATLAS_MAX_SPREAD_DAYS,
+    TARGET_ALTITUDE_DEG,
+    SEARCH_WINDOW_MINUTES,
+)
+from solar import horizon_azimuths
+
+_UTC = timezone.utc
+
+# Start of the reference year the atlas is computed for (a December solstice)
+REFERENCE_START = date(2025, 12, 21)
+CYCLE_DAYS = 366  # Sunsets computed per latitude, up to and including the next December solstice
+
+BEARING_MIN = 180.0
+BEARING_MAX = 360.0
+
+
+def _manifest_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _crossings(azimuths, minutes, bearings):
+    """
+    Crossing day and sunset time for each bearing, on the monotonic stretch of azimuths.
+
+    azimuths must be non-decreasing (pass the falling half reversed, with its day indexes).
+    """
+    days = np.arange(len(azimuths), dtype=np.float64)
+    azimuths = np.maximum.accumulate(azimuths)  # guard against float noise at the solstice
+    day = np.interp(bearings, azimuths, days, left=np.nan, right=np.nan)
+    valid = np.isfinite(day)
+    sunset = np.full(len(bearings), np.nan)
+    sunset[valid] = np.interp(day[valid], days, minutes)
+    return day, sunset
+
+
+class HengeAtlas:
+    """
+    O(1) lookups of the days a bearing is aligned with the sunset, from the memory-mapped atlas file.
+    """
+
+    def __init__(self, path=HENGE_ATLAS_PATH):
+        self.path = path
+        with open(_manifest_path(path)) as f:
+            manifest = json.load(f)
+        self.lat_start = manifest["lat_start"]
+        self.lat_step = manifest["lat_step"]
+        self.bearing_start = manifest["bearing_start"]
+        self.bearing_step = manifest["bearing_step"]
+        self.target_altitude_deg = manifest["target_altitude_deg"]
+        self.reference_start = date.fromisoformat(manifest["reference_start"])
+        self.azimuth_range = np.array(manifest["azimuth_range"])
+        self.table = np.load(path, mmap_mode="r")
+
+    @staticmethod
+    def build(
+        path=HENGE_ATLAS_PATH,
+        max_lat=HENGE_ATLAS_MAX_LAT,
+        lat_step=HENGE_ATLAS_LAT_STEP_DEG,
+        bearing_step=HENGE_ATLAS_BEARING_STEP_DEG,
+        target_altitude_deg=TARGET_ALTITUDE_DEG,
+    ):
+        """
+        Compute the atlas and write it (and its manifest) to path.
+
+        Uses the exact (secant) crossing of the target altitude, so the azimuth curves
+        are smooth. Written to temporary files first, so readers never see a partial atlas.
+        """
+        lats = np.arange(-max_lat, max_lat + lat_step / 2, lat_step)
+        bearings = np.arange(BEARING_MIN, BEARING_MAX + bearing_step / 2, bearing_step)
+        dates = [REFERENCE_START + timedelta(days=i) for i in range(CYCLE_DAYS)]
+        midnights = np.array([datetime(d.year, d.month, d.day, tzinfo=_UTC).timestamp() for d in dates])
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(lats), len(bearings), 2, 2))
+        azimuth_range = []
+
+        for i, lat in enumerate(lats):
+            azimuths, times = horizon_azimuths(
+                float(lat), 0.0, dates, _UTC, target_altitude_deg, SEARCH_WINDOW_MINUTES, "sunset", "secant"
+            )
+            minutes = (times - midnights) / 60.0
+            peak = int(np.nanargmax(azimuths))
+
+            rising_day, rising_time = _crossings(azimuths[:peak + 1], minutes[:peak + 1], bearings)
+            falling_day, falling_time = _crossings(azimuths[peak:][::-1], minutes[peak:][::-1], bearings)
+            falling_day = np.where(np.isfinite(falling_day), CYCLE_DAYS - 1 - falling_day, np.nan)
+
+            table[i, :, 0, 0] = rising_day
+            table[i, :, 0, 1] = rising_time
+            table[i, :, 1, 0] = falling_day
+            table[i, :, 1, 1] = falling_time
+            azimuth_range.append([float(np.nanmin(azimuths)), float(np.nanmax(azimuths))])
+
+        table.flush()
+        del table
+        os.replace(tmp_path, path)
+
+        tmp_manifest = f"{_manifest_path(path)}.{os.getpid()}.tmp"
+        with open(tmp_manifest, "w") as f:
+            json.dump({
+                "lat_start": float(lats[0]),
+                "lat_step": lat_step,
+                "bearing_start": BEARING_MIN,
+                "bearing_step": bearing_step,
+                "target_altitude_deg": target_altitude_deg,
+                "reference_start": REFERENCE_START.isoformat(),
+                "azimuth_range": azimuth_range,
+            }, f)
+        os.replace(tmp_manifest, _manifest_path(path))
+
+    def covers(self, lat) -> bool:
+        last = self.lat_start + self.lat_step * (self.table.shape[0] - 1)
+        return self.lat_start <= lat <= last
+
+    def crossings(self, lat, bearing, match_threshold_deg):
+        """
+        Interpolated crossings of the bearing at a latitude.
+
+        Returns:
+            list of (days after the December solstice, local mean time in minutes) for the
+            rising and falling crossings that exist, or None if the atlas can't answer
+            reliably: the latitude is outside it, or the bearing is near the turning point
+            of the sun (the crossings merge, and the sun may come within match_threshold_deg
+            of the road without crossing it).
+        """
+        if not self.covers(lat):
+            return None
+
+        lat_pos = (lat - self.lat_start) / self.lat_step
+        bearing_pos = (bearing - self.bearing_start) / self.bearing_step
+        i = min(int(math.floor(lat_pos)), self.table.shape[0] - 2)
+        j = min(max(int(math.floor(bearing_pos)), 0), self.table.shape[1] - 2)
+        lat_frac = lat_pos - i
+        bearing_frac = bearing_pos - j
+
+        # Near the turning points the two crossings merge and interpolation isn't reliable
+        for row in (i, i + 1):
+            low, high = self.azimuth_range[row]
+            if not (low + match_threshold_deg < bearing < high - match_threshold_deg):
+                if low - match_threshold_deg <= bearing <= high + match_threshold_deg:
+                    return None
+
+        # Bearings the sun never sets at
+        last_bearing = self.bearing_start + self.bearing_step * (self.table.shape[1] - 1)
+        if not self.bearing_start <= bearing <= last_bearing:
+            return []
+
+        corners = np.asarray(self.table[i:i + 2, j:j + 2], dtype=np.float64)  # (2, 2, slot, field)
+        weights = np.array([
+            [(1 - lat_frac) * (1 - bearing_frac), (1 - lat_frac) * bearing_frac],
+            [lat_frac * (1 - bearing_frac), lat_frac * bearing_frac],
+        ])
+
+        crossings = []
+        for slot in range(2):
+            days = corners[:, :, slot, 0]
+            if np.all(np.isnan(days)):
+                continue
+            if np.any(np.isnan(days)) or np.ptp(days) > HENGE_ATLAS_MAX_SPREAD_DAYS:
+                return None
+            day = float(np.sum(weights * days))
+            minutes = float(np.sum(weights * corners[:, :, slot, 1]))
+            crossings.append((day, minutes))
+        return crossings
+
+
+_henge_atlas = None
+_henge_atlas_lock = threading.Lock()
+
+
+def get_henge_atlas():
+    """
+    The shared HengeAtlas, or None if it hasn't been built (see scripts/build_henge_atlas.py).
+    """
+    global _henge_atlas
+    if _henge_atlas is None and HENGE_ATLAS_PATH and os.path.exists(_manifest_path(HENGE_ATLAS_PATH)):
+        with _henge_atlas_lock:
+            if _henge_atlas is None:
+                _henge_atlas = HengeAtlas(HENGE_ATLAS_PATH)
+    return _henge_atlas
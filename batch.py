@@ -0,0 +1,150 @@
+"""
+Batch henge lookups spread over a process pool.
+
+lookup_henges takes many addresses or coordinates (each with an optional
+road bearing) and yields each result as soon as its worker finishes, so a
+caller (or the /lookup_batch endpoint) can stream results back instead of
+waiting for the whole batch. Addresses are geocoded one at a time however
+many workers there are (see utils._wait_for_geocoding_turn), so large batches
+should give coordinates.
+
+Usage:
+    from batch import lookup_henges
+
+    for result in lookup_henges([{"address": "251 W 42nd St, New York, NY"}, {"lat": 40.75, "lon": -73.99, "road_bearing": 299}]):
+        print(result["index"], result.get("result"), result.get("error"))
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from config import BATCH_MAX_WORKERS, SEARCH_MODE
+from hengefinder import search_for_henge
+from utils import GeocodingError, check_latitude, get_coordinates, get_location, get_road_bearing, get_utc_start_date, normalize_bearing_to_180_360
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers: Optional[int] = BATCH_MAX_WORKERS) -> ProcessPoolExecutor:
+    """
+    The shared worker pool, started on first use.
+
+    Workers are spawned rather than forked: the server is multi-threaded, and
+    a forked child could inherit a lock (e.g. a cache's) held by another thread.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _discard_pool(pool):
+    """
+    Drop a broken pool (a worker died) so the next batch starts a new one.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def lookup_henge(item: dict, start_date: Optional[datetime] = None, mode: str = SEARCH_MODE) -> dict:
+    """
+    Look up the next henge for one batch item (runs in a worker process).
+
+    Args:
+        item: dict with either "address" or "lat"/"lon", and optionally "road_bearing"
+        start_date: Start date of the search (defaults to today, UTC)
+        mode: Search mode passed to search_for_henge
+
+    Returns:
+        dict with the coordinates, road_bearing and search_for_henge result, or an "error" message
+    """
+    try:
+        if item.get('address'):
+            location = get_location(item['address'])
+            lat, lon = get_coordinates(location)
+        else:
+            lat, lon = float(item['lat']), float(item['lon'])
+    except GeocodingError:
+        return {'error': f"Could not find the address '{item.get('address')}'."}
+    except (KeyError, TypeError, ValueError):
+        return {'error': "Each item needs an address or lat and lon."}
+
+    try:
+        check_latitude(lat)
+    except ValueError as e:
+        return {'error': str(e)}
+
+    try:
+        if item.get('road_bearing') is not None:
+            road_bearing = normalize_bearing_to_180_360(float(item['road_bearing']))
+        else:
+            road_bearing = get_road_bearing(lat, lon)
+    except (ValueError, TypeError):
+        return {'error': "Invalid road bearing value provided."}
+    except Exception:
+        return {'error': "Could not determine the street direction at this location."}
+
+    result = search_for_henge(lat, lon, start_date or get_utc_start_date(), road_bearing=road_bearing, mode=mode)
+    return {
+        'coordinates': {'lat': lat, 'lon': lon},
+        'road_bearing': round(road_bearing, 2),
+        'result': result,
+    }
+
+
+def lookup_henges(
+    items: Iterable[dict],
+    start_date: Optional[datetime] = None,
+    mode: str = SEARCH_MODE,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> Iterator[dict]:
+    """
+    Look up the next henge for many items in parallel, yielding results as they complete.
+
+    Args:
+        items: dicts with either "address" or "lat"/"lon", and optionally "road_bearing"
+        start_date: Start date of the search (defaults to today, UTC)
+        mode: Search mode passed to search_for_henge
+        pool: Executor to use (defaults to the shared process pool)
+
+    Yields:
+        dict with the item's "index" in items, the item itself, and the lookup_henge fields.
+        Results come in completion order, not input order.
+    """
+    pool = pool or get_pool()
+    start_date = start_date or get_utc_start_date()
+    futures = {}
+    try:
+        for index, item in enumerate(items):
+            futures[pool.submit(lookup_henge, item, start_date, mode)] = (index, item)
+
+        for future in as_completed(futures):
+            index, item = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                print(f"Batch worker died on item {index}: {e}")
+                _discard_pool(pool)
+                result = {'error': 'An unexpected error occurred while processing this item.'}
+            except Exception as e:
+                print(f"Error in batch lookup for item {index}: {e}")
+                result = {'error': 'An unexpected error occurred while processing this item.'}
+            yield {'index': index, 'item': item, **result}
+    finally:
+        # Stop queued work if the caller stops early (e.g. the client disconnected)
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,265 @@
+"""
+Small caching helpers shared by the lookup paths.
+
+LRUCache is an in-process, size-bounded LRU with an optional SQLite tier,
+so cached results survive restarts and can be shared by processes on the
+same machine (see serving.py). Entries can optionally expire after a TTL. Keys are tuples of
+JSON-able values; values must be JSON serializable if the disk tier is used.
+
+SingleFlight coalesces concurrent identical calls: while a computation for
+a key is running, other callers with the same key wait for it and share its
+result (or exception) instead of repeating it.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Caches with a SQLite tier, so their connections can be reopened after a fork
+_disk_caches = weakref.WeakSet()
+
+
+class LRUCache:
+    """
+    In-memory LRU cache with an optional on-disk (SQLite) second tier.
+
+    Args:
+        name: Name used for the SQLite table and in stats
+        max_entries: Maximum number of entries kept in memory (least recently used are evicted)
+        db_path: Optional path to a SQLite file for the persistent tier
+        decode: Optional function applied to values loaded from disk (e.g. to restore int keys)
+        ttl_seconds: Optional time after which entries expire
+    """
+
+    def __init__(self, name, max_entries=256, db_path=None, decode=None, ttl_seconds=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.decode = decode
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._connect()
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+            )
+            self._db.commit()
+            _disk_caches.add(self)
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        # WAL lets readers in other processes carry on while one of them writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+
+    def reopen(self):
+        """
+        Open a new connection to the SQLite tier. Call in a forked child: SQLite
+        connections must not be used across a fork.
+        """
+        if self.db_path:
+            self._lock = threading.Lock()
+            self._connect()
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key)
+
+    def _expired(self, created):
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it isn't cached (or has expired).
+        """
+        k = self._key(key)
+        with self._lock:
+            expired = False
+            if k in self._entries:
+                value, created = self._entries[k]
+                if not self._expired(created):
+                    self._entries.move_to_end(k)
+                    self.hits += 1
+                    return value
+                del self._entries[k]
+                expired = True
+
+            if self._db is not None:
+                row = self._db.execute(f"SELECT value, created FROM {self.name} WHERE key = ?", (k,)).fetchone()
+                if row is not None and self._expired(row[1]):
+                    self._db.execute(f"DELETE FROM {self.name} WHERE key = ?", (k,))
+                    self._db.commit()
+                    expired = True
+                elif row is not None:
+                    value = json.loads(row[0])
+                    if self.decode is not None:
+                        value = self.decode(value)
+                    self._remember(k, value, row[1])
+                    self.disk_hits += 1
+                    return value
+
+            if expired:
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Cache value under key (in memory, and on disk if configured).
+        """
+        k = self._key(key)
+        created = time.time()
+        with self._lock:
+            self._remember(k, value, created)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.name} (key, value, created) VALUES (?, ?, ?)",
+                    (k, json.dumps(value), created),
+                )
+                self._db.commit()
+
+    def _remember(self, k, value, created):
+        self._entries[k] = (value, created)
+        self._entries.move_to_end(k)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def preload(self):
+        """
+        Load the most recently written entries from the disk tier into memory (up to max_entries).
+
+        Returns:
+            int: entries loaded
+        """
+        if self._db is None:
+            return 0
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value, created FROM {self.name} ORDER BY created DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+            loaded = 0
+            for k, value, created in reversed(rows):
+                if self._expired(created):
+                    continue
+                value = json.loads(value)
+                if self.decode is not None:
+                    value = self.decode(value)
+                self._remember(k, value, created)
+                loaded += 1
+        return loaded
+
+    def clear(self):
+        """
+        Drop all entries (memory and disk) and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.name}")
+                self._db.commit()
+            self.hits = self.disk_hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """
+        Hit/miss counters for monitoring.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+def reopen_databases():
+    """
+    Reopen the SQLite connection of every cache with a disk tier (in a forked child).
+    """
+    for cache in list(_disk_caches):
+        cache.reopen()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same key share its outcome.
+
+    Args:
+        name: Name used in stats
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Return fn(*args, **kwargs), or the result of the identical call already in flight for key.
+
+        Keys are hashable (e.g. tuples of canonicalized inputs). Results are shared, not copied,
+        so callers must not modify them.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """
+        Call counters for monitoring.
+        """
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'deduplicated': self.deduplicated,
+            'in_flight': len(self._flights),
+        }
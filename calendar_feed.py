@@ -0,0 +1,62 @@
+"""
+iCalendar (RFC 5545) feeds of henge events, so calendar apps can subscribe to a street's henges.
+
+henge_calendar turns the events of hengefinder.iter_henges into the lines of
+a VCALENDAR document as they come, so a feed can be streamed without
+materializing every event first.
+
+Usage:
+    from calendar_feed import henge_calendar
+    from hengefinder import iter_henges
+
+    for line in henge_calendar(iter_henges(lat, lon, road_bearing, start, end), lat, lon, road_bearing):
+        sys.stdout.write(line)
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+
+from config import HENGE_EVENT_MINUTES
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ical_time(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def henge_calendar(events: Iterable[dict], lat: float, lon: float, road_bearing: float, name: str = "Henges") -> Iterator[str]:
+    """
+    Yield the CRLF-terminated lines of an iCalendar document with one event per henge.
+
+    Args:
+        events: henge events (dicts with henge_date and sun_angle, as from iter_henges)
+        lat: latitude of the street
+        lon: longitude of the street
+        road_bearing: Road's bearing angle in degrees
+        name: Calendar name
+    """
+    stamp = _ical_time(datetime.now(timezone.utc))
+    yield "BEGIN:VCALENDAR\r\n"
+    yield "VERSION:2.0\r\n"
+    yield "PRODID:-//hengefinder//henge events//EN\r\n"
+    yield "CALSCALE:GREGORIAN\r\n"
+    yield f"X-WR-CALNAME:{_escape(name)}\r\n"
+
+    for event in events:
+        start = datetime.fromisoformat(event['henge_date'])
+        # Stable across feed refreshes, so calendar apps update events instead of duplicating them
+        uid = hashlib.sha1(f"{lat:.5f},{lon:.5f},{road_bearing:.2f},{start.date().isoformat()}".encode()).hexdigest()
+        yield "BEGIN:VEVENT\r\n"
+        yield f"UID:{uid}@hengefinder\r\n"
+        yield f"DTSTAMP:{stamp}\r\n"
+        yield f"DTSTART:{_ical_time(start)}\r\n"
+        yield f"DTEND:{_ical_time(start + timedelta(minutes=HENGE_EVENT_MINUTES))}\r\n"
+        summary = f"Henge: the sun sets along the street ({event['sun_angle']}°)"
+        yield f"SUMMARY:{_escape(summary)}\r\n"
+        yield f"GEO:{lat:.6f};{lon:.6f}\r\n"
+        yield "END:VEVENT\r\n"
+
+    yield "END:VCALENDAR\r\n"
@@ -2,11 +2,113 @@
 TARGET_ALTITUDE_DEG = 0.5  # Sun elevation for henge effect (degrees). Sun will be sitting on the horizon.
 SEARCH_WINDOW_MINUTES = 20  # Minutes before sunset to search
 MATCH_THRESHOLD_DEG = 0.25   # How close (in degrees) sun must be to road bearing (degrees) to be considered aligned
+HENGE_MERGE_DAYS = 2  # Alignments at most this many days apart count as one henge (whole-minute sunset times make the daily azimuth jitter near the solstices)
+
+HORIZON_SOLVER = "binary"  # "binary" (whole-minute search) or "secant" (sub-second root finding, fewer evaluations)
+SOLAR_ENGINE = "numpy"  # "numpy" (vectorized, see solar.py) or "astral" (reference implementation)
+
+# Ephemeris table (see solar.EphemerisTable), built on first use and shared read-only by all processes
+EPHEMERIS_TABLE_PATH = "data/ephemeris.npy"  # None to always compute declination/equation of time directly
+EPHEMERIS_TABLE_START_YEAR = 2020
+EPHEMERIS_TABLE_END_YEAR = 2040
+EPHEMERIS_TABLE_STEP_MINUTES = 30
 
 # Search parameters  
 MAX_DAYS_TO_SEARCH = 365    # How many days to search forward
 COARSE_SEARCH_STEP_DAYS = 30 # Days between coarse search points
 FINE_SEARCH_WINDOW_DAYS = 7  # Days to search backwards when coarse match is found
+SEARCH_MODE = "coarse"  # "coarse" (coarse/fine search for the first henge), "adaptive" (secant steps, see search_adaptive_for_henge), "all" (one pass over every day, every henge), "atlas" (precomputed, see atlas.py) or "both" (sunrise and sunset henges, both ways along the road)
+ADAPTIVE_BRACKET_DAYS = 3  # Adaptive search checks day by day once the alignment is bracketed to this many days
+HENGE_STREAM_CHUNK_DAYS = 366  # Days of azimuths calculated at a time by iter_henges (bounds its memory)
+HENGE_STREAM_MAX_GAP_DAYS = 2 * 366  # iter_henges stops after this long without a henge (the sun never reaches the road)
+
+# Henge atlas (see atlas.py), built with scripts/build_henge_atlas.py and used by the "atlas" search mode
+HENGE_ATLAS_PATH = "data/henge_atlas.npy"  # None to disable (the "atlas" mode then searches like "all")
+HENGE_ATLAS_MAX_LAT = 60  # Same limit as check_latitude
+HENGE_ATLAS_LAT_STEP_DEG = 0.25
+HENGE_ATLAS_BEARING_STEP_DEG = 0.1
+HENGE_ATLAS_MAX_SPREAD_DAYS = 3  # Fall back to an exact search if neighbouring grid points disagree by more than this
+HENGE_ATLAS_REFINE = False  # Refine atlas dates with exact sun positions by default
+HENGE_ATLAS_REFINE_DAYS = 2  # Days either side of an atlas date checked when refining
+
+# Timezone lookups (see timezones.py)
+TIMEZONE_CELL_DEG = 0.1  # Grid cell size; cells entirely within one zone are resolved without a polygon test
+TIMEZONE_CACHE_MAX_CELLS = 100000  # Cells memoized in memory
+TIMEZONE_CACHE_DB = "data/timezone_cache.sqlite"  # SQLite file so memoized cells survive restarts and are shared by server workers (None for memory only)
 
 # Road detection parameters
-ROAD_SEARCH_RADIUS_M = 100  # Meters to search for nearby roads to get road bearing
\ No newline at end of file
+ROAD_SEARCH_RADIUS_M = 100  # Meters to search for nearby roads to get road bearing
+ROAD_TILES_DIR = "data/road_tiles"  # Local road network tiles (see road_store.py); addresses outside them download from OSM
+ROAD_TILE_SIZE_DEG = 0.05  # Tile size in degrees
+ROAD_TILE_CELLS = 64  # Spatial index resolution within a tile (cells per side)
+ROAD_TILE_CACHE_SIZE = 256  # Tiles kept in memory
+
+# Caching parameters
+AZIMUTH_CACHE_MAX_ENTRIES = 512  # Annual azimuth curves kept in memory (least recently used are evicted)
+AZIMUTH_CACHE_DB = "data/azimuth_cache.sqlite"  # SQLite file so cached curves survive restarts and are shared by server workers (None for memory only)
+HENGE_RESULT_CACHE_MAX_ENTRIES = 10000  # Search results kept in memory, reused until the henge they found has passed
+HENGE_RESULT_CACHE_DB = "data/henge_result_cache.sqlite"  # SQLite file so search results survive restarts and are shared by server workers (None for memory only)
+HENGE_RESULT_CACHE_PRECISION = 4  # Decimal places coordinates are rounded to in the search result cache (~10 m)
+GEOCODE_CACHE_MAX_ENTRIES = 10000  # Geocoding results kept in memory
+GEOCODE_CACHE_DB = "data/geocode_cache.sqlite"  # SQLite file so geocoding results survive restarts (None for memory only)
+GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 3600  # How long geocoding results are reused
+GEOCODE_NEGATIVE_TTL_SECONDS = 24 * 3600  # How long "address not found" results are reused
+REVERSE_GEOCODE_PRECISION = 5  # Decimal places coordinates are rounded to for reverse geocoding (~1 m)
+GEOCODE_MIN_INTERVAL_SECONDS = 1.0  # Least time between Nominatim requests (its usage policy allows 1 per second)
+GEOCODE_RATE_FILE = "data/geocode_rate.lock"  # File that spaces out Nominatim requests across processes (None for this process only)
+
+# Street alignment index (see street_index.py), used by the map page to highlight aligned streets
+STREET_INDEX_DIR = "data/street_index"  # Saved city indexes (None to rebuild on every restart)
+STREET_INDEX_RADIUS_M = 25000  # Radius of streets indexed around a city center
+STREET_INDEX_CITY_PRECISION = 1  # Decimal places city centers are rounded to (~11 km, well inside the radius)
+STREET_INDEX_CELL_DEG = 0.01  # Spatial grid cell size in degrees
+STREET_INDEX_CACHE_SIZE = 16  # City indexes kept in memory
+STREET_INDEX_MAX_RESULTS = 2000  # Maximum streets returned per query
+
+# Batch lookups (see batch.py)
+BATCH_MAX_WORKERS = None  # Worker processes for batch lookups (None for one per CPU)
+BATCH_MAX_ITEMS = 5000  # Maximum items per /lookup_batch request
+BATCH_MAX_ADDRESSES = 50  # Maximum items given by address per /lookup_batch request (geocoding is rate limited)
+
+# /lookup_address pipeline (see pipeline.py): the stages after geocoding run concurrently
+LOOKUP_PIPELINE_THREADS = 32  # Threads shared by all in-flight lookups
+LOOKUP_STAGE_TIMEOUT_SECONDS = {
+    "concise_address": 10,  # Reverse geocode
+    "road_bearing": 60,  # Road network download (or local tiles)
+    "timezone": 10,
+}
+
+# Instrumentation (see metrics.py): Server-Timing headers and /metrics
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# HTTP caching of the GET solar data endpoints (/lookup_sun_angles, /lookup_azimuth_altitude)
+SOLAR_HTTP_MAX_AGE_SECONDS = 365 * 24 * 3600  # Responses are pure functions of their (canonical) query, so cache them for long
+SOLAR_DATA_VERSION = 1  # Part of every ETag; bump when a change alters solar results so cached copies are invalidated
+
+# Demo observer for the landing page sun animation (/lookup_azimuth_altitude)
+DEMO_ADDRESS = "251 W 42nd St, New York, NY"
+DEMO_COORDINATES = (40.7568, -73.9888)  # Coordinates of DEMO_ADDRESS, so startup doesn't need to geocode it (None to geocode on first use)
+DEMO_ROAD_BEARING = 299.5  # Manhattan street bearing
+
+# Sun position curves for the landing page sliders (/lookup_sun_curve)
+SUN_CURVE_MAX_SAMPLES = 1441  # Most samples returned in one curve (a day at one-minute steps)
+
+# Background lookups (see jobs.py): POST /jobs, then poll GET /jobs/<id>
+JOB_WORKERS = 4  # Worker threads running queued lookups
+JOB_MAX_PENDING = 64  # Jobs queued or running at once; further submissions get a 429
+JOB_RESULT_TTL_SECONDS = 600  # How long finished jobs (and their results) are kept
+JOB_MAX_WAIT_SECONDS = 25  # Longest a GET /jobs/<id>?wait= long-poll is held open
+JOB_RETRY_AFTER_SECONDS = 5  # Retry-After sent with a 429 when the queue is full
+JOB_DB = "data/jobs.sqlite"  # SQLite file so any server worker can answer polls for a job (None for this process only)
+JOB_POLL_INTERVAL_SECONDS = 0.25  # How often a long-poll checks JOB_DB for a job running in another worker
+
+# Production serving (see serving.py and gunicorn.conf.py)
+SERVER_BIND = "0.0.0.0:8080"
+SERVER_WORKERS = None  # Worker processes (None for one per CPU)
+SERVER_THREADS = 8  # Threads per worker; requests mostly wait on geocoding and OSM
+SERVER_TIMEOUT_SECONDS = 120  # Workers silent for longer are restarted (a cold lookup can take a minute)
+
+# Henge event streams (/henge_events, scripts/henge_events.py)
+HENGE_EVENT_MINUTES = 10  # Length of each calendar event
+HENGE_FEED_DEFAULT_YEARS = 5  # Years an iCalendar feed covers when no end or count is given (NDJSON streams indefinitely)
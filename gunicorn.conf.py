@@ -0,0 +1,24 @@
+"""
+gunicorn settings for production serving (see serving.py).
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+"""
+import os
+
+from config import SERVER_BIND, SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT_SECONDS
+
+wsgi_app = "app:create_app()"
+bind = SERVER_BIND
+workers = SERVER_WORKERS or os.cpu_count()
+threads = SERVER_THREADS
+timeout = SERVER_TIMEOUT_SECONDS
+
+# Build the app (and load the shared data) once in the master, then fork the workers from it
+preload_app = True
+
+
+def post_fork(server, worker):
+    from serving import after_fork
+
+    after_fork()
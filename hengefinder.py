@@ -1,11 +1,28 @@
 
-from datetime import datetime, timedelta
+import copy
+from datetime import datetime, timedelta, timezone, date as date_type
 from astral import Observer
-from typing import Optional
+from typing import Iterator, Optional
 import numpy as np
 from zoneinfo import ZoneInfo
-from utils import get_horizon_azimuth, get_closest_alignment_direction, check_match, get_timezone_from_coordinates, get_road_bearing, get_location, get_coordinates, check_latitude, get_utc_start_date
-from config import MATCH_THRESHOLD_DEG, MAX_DAYS_TO_SEARCH, COARSE_SEARCH_STEP_DAYS, TARGET_ALTITUDE_DEG, FINE_SEARCH_WINDOW_DAYS
+from utils import get_horizon_azimuth, get_horizon_azimuths, get_sunrise_sunset_azimuths, find_alignment_days, count_ephemeris_evaluations, get_closest_alignment_direction, check_match, get_timezone_from_coordinates, get_road_bearing, get_location, get_coordinates, check_latitude, get_utc_start_date, normalize_bearing_to_180_360
+from metrics import timed, count
+from cache import LRUCache, SingleFlight
+from solar import to_local_date
+from atlas import get_henge_atlas
+from config import MATCH_THRESHOLD_DEG, MAX_DAYS_TO_SEARCH, COARSE_SEARCH_STEP_DAYS, TARGET_ALTITUDE_DEG, FINE_SEARCH_WINDOW_DAYS, SOLAR_ENGINE, HORIZON_SOLVER, SEARCH_MODE, ADAPTIVE_BRACKET_DAYS, HENGE_ATLAS_REFINE, HENGE_ATLAS_REFINE_DAYS, HENGE_RESULT_CACHE_MAX_ENTRIES, HENGE_RESULT_CACHE_DB, HENGE_RESULT_CACHE_PRECISION, HENGE_STREAM_CHUNK_DAYS, HENGE_STREAM_MAX_GAP_DAYS, HENGE_MERGE_DAYS
+
+# Concurrent identical searches share one calculation (see cache.SingleFlight)
+search_flight = SingleFlight("search")
+
+# Search results with the local day their search started on, keyed on the rounded location, road
+# bearing, search settings, solar engine and horizon solver. Reused by later searches until the henge they found has passed
+# (see _reuse_henge_result), so the same question asked tomorrow isn't searched again.
+henge_result_cache = LRUCache(
+    "henge_results",
+    max_entries=HENGE_RESULT_CACHE_MAX_ENTRIES,
+    db_path=HENGE_RESULT_CACHE_DB,
+)
 
 
 def search_for_henge(
@@ -15,18 +32,30 @@ def search_for_henge(
     match_threshold_deg: float=MATCH_THRESHOLD_DEG, 
     step_size: int=COARSE_SEARCH_STEP_DAYS,
     road_bearing: Optional[float] = None,
+    mode: str = SEARCH_MODE,
+    tz: Optional[ZoneInfo] = None,
+    refine: bool = HENGE_ATLAS_REFINE,
 ):
     """
     Check if a henge occurs for the latitude/longitude specified.
 
     Starts with a course search over days and then moves to a fine-grained search if required.
+    With mode="all", calculates every day in one pass instead and reports every henge (see search_all_henges).
+    With mode="adaptive", takes secant steps towards the predicted alignment date (see search_adaptive_for_henge).
+    With mode="atlas", looks the henges up in the precomputed atlas (see search_atlas_for_henge), searching
+    like mode="all" where the atlas isn't available or can't answer reliably.
+    With mode="both", reports sunrise as well as sunset henges, looking both ways along the road
+    (see search_sunrise_sunset_henges).
 
     Args:
         lat: latitude
         lon: longitude
         date: start date of the search
         match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
-        step_size: Days between coarse search dates
+        step_size: Days between coarse search dates (the largest step in adaptive mode)
+        mode: "coarse" (coarse/fine search for the first henge), "adaptive", "all" (one pass, every henge), "atlas" or "both"
+        tz: Timezone of the location (looked up if not given)
+        refine: With mode="atlas", check the atlas dates against exact sun positions
 
     Returns:
         result (dict):
@@ -35,11 +64,124 @@ def search_for_henge(
             sun_angle (float): Sun's azimuth angle in degrees
             road_bearing (float): Road's bearing angle in degrees
             days_searched (int): Number of days searched in the coarse search
+            ephemeris_evaluations (int): Number of daily sun azimuth calculations the search needed
+
+    Concurrent calls with the same arguments (the location rounded to HENGE_RESULT_CACHE_PRECISION
+    decimals and the bearing to 0.01 degrees) share one search (and its result dict). A result
+    is reused (with ephemeris_evaluations 0) by later searches at the same place and bearing until
+    the henge it found has passed.
     """
+    key = (
+        round(lat, HENGE_RESULT_CACHE_PRECISION),
+        round(lon, HENGE_RESULT_CACHE_PRECISION),
+        date.isoformat(),
+        match_threshold_deg,
+        step_size,
+        round(road_bearing, 2) if road_bearing is not None else None,
+        mode,
+        str(tz) if tz else None,
+        refine,
+    )
+    return search_flight.do(key, _search_for_henge, lat, lon, date, match_threshold_deg, step_size, road_bearing, mode, tz, refine)
+
+
+def _search_for_henge(lat, lon, date, match_threshold_deg, step_size, road_bearing, mode, tz, refine):
     if road_bearing is None:
         road_bearing = get_road_bearing(lat, lon)
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+
+    start_day = to_local_date(date, tz)
+    result_key = (
+        round(lat, HENGE_RESULT_CACHE_PRECISION),
+        round(lon, HENGE_RESULT_CACHE_PRECISION),
+        round(road_bearing, 2),
+        match_threshold_deg,
+        TARGET_ALTITUDE_DEG,
+        step_size,
+        mode,
+        refine,
+        SOLAR_ENGINE,
+        HORIZON_SOLVER,
+    )
+    result = _reuse_henge_result(henge_result_cache.get(result_key), start_day)
+    if result is not None:
+        count("search_results_reused")
+        return result
+
+    count("searches")
+    with timed("search"), count_ephemeris_evaluations() as counter:
+        if mode == "atlas":
+            result = search_atlas_for_henge(lat, lon, date, match_threshold_deg, road_bearing=road_bearing, refine=refine, tz=tz)
+            if result is None:  # no atlas, or it can't answer reliably
+                result = search_all_henges(lat, lon, date, match_threshold_deg, road_bearing=road_bearing, tz=tz)
+        elif mode == "both":
+            result = search_sunrise_sunset_henges(lat, lon, date, match_threshold_deg, road_bearing=road_bearing, tz=tz)
+        elif mode == "all":
+            result = search_all_henges(lat, lon, date, match_threshold_deg, road_bearing=road_bearing, tz=tz)
+        elif mode == "adaptive":
+            result = search_adaptive_for_henge(lat, lon, date, match_threshold_deg, step_size, road_bearing, tz=tz)
+        else:
+            result = _search_coarse_for_henge(lat, lon, date, match_threshold_deg, step_size, road_bearing, tz)
+
+    result['ephemeris_evaluations'] = counter['evaluations']
+    if 'error' not in result:
+        # A copy, so callers (and flight waiters) that modify the result they get don't change the cache
+        henge_result_cache.set(result_key, {'start': start_day.isoformat(), 'result': copy.deepcopy(result)})
+    return result
+
+
+def _reuse_henge_result(entry, day):
+    """
+    The cached search result as a search starting on (local) day would find it, or None if it can't be reused.
+
+    A result holds from the day its search started until its henge has passed: whichever day in
+    between a search starts on, it finds the same henge first. A result that lists every henge in
+    its window (mode="all", "both" or "atlas") is only reused by a search of that same window: one
+    starting later would also list the henges past the end of it. A year without any henge means
+    the sun never reaches the road's bearing (its range repeats every year), so that holds until
+    the searched window ends.
+    """
+    if entry is None:
+        return None
+    start = date_type.fromisoformat(entry['start'])
+    result = entry['result']
+    if day < start:
+        return None
+
+    if result['henge_found']:
+        if 'henges' in result:
+            if day != start:
+                return None
+            reused = copy.deepcopy(result)
+        elif datetime.fromisoformat(result['henge_date']).date() >= day:
+            reused = copy.deepcopy(result)
+        else:
+            return None
+    else:
+        days_searched = result.get('days_searched', 0)
+        if day > start + timedelta(days=days_searched) or (day > start and days_searched < 365):
+            return None
+        reused = copy.deepcopy(result)
 
-    tz = get_timezone_from_coordinates(lat, lon)
+    reused['ephemeris_evaluations'] = 0
+    return reused
+
+
+def _search_coarse_for_henge(
+    lat: float,
+    lon: float,
+    date: datetime,
+    match_threshold_deg: float,
+    step_size: int,
+    road_bearing: float,
+    tz: Optional[ZoneInfo] = None,
+):
+    """
+    Coarse search over days, moving to a fine-grained search if required. See search_for_henge.
+    """
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
     obs = Observer(lat, lon)
 
     az_today, exact_time_today    = get_horizon_azimuth(tz, obs, date, target_altitude_deg=TARGET_ALTITUDE_DEG)
@@ -101,6 +243,7 @@ def search_for_henge(
         curr_date = prev_date + timedelta(days=step)
 
         while curr_date <= end_date:
+            count("search_iterations")
             az_curr_date, exact_time = get_horizon_azimuth(tz, obs, curr_date, target_altitude_deg=TARGET_ALTITUDE_DEG)
             if az_curr_date == None:
                 print('Could not get azimuth, skipping...')
@@ -191,25 +334,544 @@ def search_for_henge(
 
     return result
 
+def search_adaptive_for_henge(
+    lat: float,
+    lon: float,
+    date: datetime,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    max_step: int = COARSE_SEARCH_STEP_DAYS,
+    road_bearing: Optional[float] = None,
+    bracket_days: int = ADAPTIVE_BRACKET_DAYS,
+    tz: Optional[ZoneInfo] = None,
+):
+    """
+    Search for the first henge by stepping towards the predicted alignment date.
+
+    The sun's azimuth moves quickly around the equinoxes and barely moves around the solstices,
+    so instead of a fixed coarse step, the rate of change of the bearing difference is estimated
+    from the last two samples and a secant step is taken straight to where it should reach zero
+    (capped at max_step days; a full max_step is taken while the sun is moving away from the road).
+
+    Once the alignment is bracketed (the difference changes sign), the bracket is shrunk with
+    false-position steps to bracket_days and only those days are checked one by one. When the
+    sun turns around (solstice), the vertex of a parabola through the last three samples tells
+    us whether it came close enough to the road to check the days around it.
+
+    Args:
+        lat: latitude
+        lon: longitude
+        date: start date of the search
+        match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
+        max_step: Largest step in days
+        road_bearing: Road's bearing angle in degrees (looked up if not given)
+        bracket_days: Size of the bracket (days) that is checked day by day
+        tz: Timezone of the location (looked up if not given)
+
+    Returns:
+        result (dict): same fields as search_for_henge
+    """
+    if road_bearing is None:
+        road_bearing = get_road_bearing(lat, lon)
+
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+    obs = Observer(lat, lon)
+    samples = {}
+
+    def _sample(day):
+        """ (azimuth, exact_time, bearing difference) for a day offset, calculated once per search """
+        if day not in samples:
+            az, exact_time = get_horizon_azimuth(tz, obs, date + timedelta(days=day), target_altitude_deg=TARGET_ALTITUDE_DEG)
+            diff = None if az is None else get_closest_alignment_direction(az, road_bearing)[0]
+            samples[day] = (az, exact_time, diff)
+        return samples[day]
+
+    def _matches(day):
+        az, _, _ = _sample(day)
+        return az is not None and check_match(az, road_bearing, match_threshold_deg)
+
+    def _first_match(start, end):
+        """ Day by day check; returns the first matching day offset in [start, end], or None """
+        for day in range(max(start, 0), min(end, MAX_DAYS_TO_SEARCH) + 1):
+            if _matches(day):
+                # The bracket may start inside the matching days, so walk back to the first of them
+                while day > 0 and _matches(day - 1):
+                    day -= 1
+                return day
+        return None
+
+    def _next_valid(day):
+        """ First day offset from `day` onwards with a sun position """
+        while day <= MAX_DAYS_TO_SEARCH and _sample(day)[2] is None:
+            day += 1
+        return day
+
+    def _result(day):
+        if day is None:
+            return {
+                'henge_found': False,
+                'henge_date': None,
+                'henge_time_local_str': None,
+                'henge_timezone': None,
+                'sun_angle': None,
+                'road_bearing': round(road_bearing, 2),
+                'days_searched': MAX_DAYS_TO_SEARCH
+            }
+        az, exact_time, _ = samples[day]
+        return {
+            'henge_found': True,
+            'henge_date': exact_time.isoformat(),
+            'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+            'henge_timezone': exact_time.tzname(),
+            'sun_angle': round(az, 2),
+            'road_bearing': round(road_bearing, 2),
+            'days_searched': day
+        }
+
+    t0 = _next_valid(0)
+    t1 = _next_valid(t0 + 1)
+    if t1 > MAX_DAYS_TO_SEARCH:
+        return {'error': 'Could not calculate sun position'}
+
+    match = _first_match(t0, t1)
+    if match is not None:
+        return _result(match)
+
+    d0, d1 = samples[t0][2], samples[t1][2]
+
+    while t1 < MAX_DAYS_TO_SEARCH:
+        count("search_iterations")
+        # Secant step: days until the bearing difference reaches zero at the current rate
+        rate = (d1 - d0) / (t1 - t0)
+        predicted = -d1 / rate if rate != 0 else 0
+        step = predicted if predicted > 0 else max_step
+        step = int(min(max(round(step), 1), max_step))
+
+        t2 = _next_valid(min(t1 + step, MAX_DAYS_TO_SEARCH))
+        if t2 > MAX_DAYS_TO_SEARCH:
+            break
+        d2 = samples[t2][2]
+
+        if (d1 >= 0) != (d2 >= 0):
+            # Crossed the road bearing: shrink the bracket with false-position steps, then check daily
+            a, da, b, db = t1, d1, t2, d2
+            while b - a > bracket_days:
+                m = int(round(a - da * (b - a) / (db - da)))
+                m = _next_valid(min(max(m, a + 1), b - 1))
+                if m >= b:
+                    break
+                dm = samples[m][2]
+                if (dm >= 0) == (da >= 0):
+                    a, da = m, dm
+                else:
+                    b, db = m, dm
+            match = _first_match(a, b)
+        elif np.sign(d2 - d1) != np.sign(d1 - d0):
+            # The sun turned around: check around the vertex if it may have come close to the road
+            denominator = (t0 - t1) * (t0 - t2) * (t1 - t2)
+            A = (t2 * (d1 - d0) + t1 * (d0 - d2) + t0 * (d2 - d1)) / denominator
+            B = (t2**2 * (d0 - d1) + t1**2 * (d2 - d0) + t0**2 * (d1 - d2)) / denominator
+            vertex = -B / (2 * A) if A != 0 else t1
+            vertex = min(max(vertex, t1), t2)
+            closest = A * vertex**2 + B * vertex + (d0 - A * t0**2 - B * t0)
+            if abs(closest) < 2 * match_threshold_deg:
+                match = _first_match(int(vertex) - bracket_days, int(vertex) + bracket_days)
+        elif check_match(samples[t2][0], road_bearing, match_threshold_deg):
+            # Landed on a match without crossing: find the first matching day
+            match = _first_match(t1 + 1, t2)
+
+        if match is not None:
+            return _result(match)
+
+        t0, d0, t1, d1 = t1, d1, t2, d2
+
+    return _result(None)
+
+
+def search_all_henges(
+    lat: float,
+    lon: float,
+    date: datetime,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    road_bearing: Optional[float] = None,
+    days: int = MAX_DAYS_TO_SEARCH,
+    solver: str = HORIZON_SOLVER,
+    tz: Optional[ZoneInfo] = None,
+):
+    """
+    Find every henge within the search window in one pass.
+
+    Calculates the daily azimuth series for the whole window in one vectorized batch, then finds
+    every day the sun crosses (or comes within match_threshold_deg of) the road bearing. Unlike the
+    coarse/fine search this can't miss a henge that falls between coarse steps, and it usually
+    finds two per year (one as the sun moves north, one as it moves south).
+
+    Args:
+        lat: latitude
+        lon: longitude
+        date: start date of the search
+        match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
+        road_bearing: Road's bearing angle in degrees (looked up if not given)
+        days: Number of days to search
+        solver: "binary" or "secant" (see get_horizon_azimuth)
+        tz: Timezone of the location (looked up if not given)
+
+    Returns:
+        result (dict): the same fields as search_for_henge for the first henge, plus
+            henges (list): a dict with henge_date, henge_time_local_str, henge_timezone and sun_angle for each henge
+    """
+    if road_bearing is None:
+        road_bearing = get_road_bearing(lat, lon)
+
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+    obs = Observer(lat, lon)
+
+    dates = [date + timedelta(days=i) for i in range(days + 1)]
+    horizon = get_horizon_azimuths(
+        tz, obs, dates, target_altitude_deg=TARGET_ALTITUDE_DEG, engine="numpy", solver=solver
+    )
+    azimuths = [np.nan if az is None else az for az, _ in horizon]
+
+    henges = []
+    for day_index in find_alignment_days(azimuths, road_bearing, match_threshold_deg):
+        azimuth, exact_time = horizon[day_index]
+        henges.append({
+            'henge_date': exact_time.isoformat(),
+            'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+            'henge_timezone': exact_time.tzname(),
+            'sun_angle': round(azimuth, 2),
+        })
+
+    first = henges[0] if henges else {
+        'henge_date': None,
+        'henge_time_local_str': None,
+        'henge_timezone': None,
+        'sun_angle': None,
+    }
+    return {
+        'henge_found': bool(henges),
+        **first,
+        'road_bearing': round(road_bearing, 2),
+        'days_searched': days,
+        'henges': henges,
+    }
+
+def search_sunrise_sunset_henges(
+    lat: float,
+    lon: float,
+    date: datetime,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    road_bearing: Optional[float] = None,
+    days: int = MAX_DAYS_TO_SEARCH,
+    solver: str = HORIZON_SOLVER,
+    tz: Optional[ZoneInfo] = None,
+):
+    """
+    Find every sunrise and sunset henge within the search window, looking both ways along the road.
+
+    Looking one way along the road (its bearing in 180-360) it can line up with the sunset, and
+    looking the other way (180 degrees less) with the sunrise. The sunrise and sunset azimuths for
+    the whole window are calculated together in one pass (see utils.get_sunrise_sunset_azimuths),
+    and the henges are found in each series as search_all_henges finds them.
+
+    Args:
+        lat: latitude
+        lon: longitude
+        date: start date of the search
+        match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
+        road_bearing: Road's bearing angle in degrees, either way along the road (looked up if not given)
+        days: Number of days to search
+        solver: "binary" or "secant" (see get_horizon_azimuth)
+        tz: Timezone of the location (looked up if not given)
+
+    Returns:
+        result (dict): the same fields as search_all_henges for the first henge, sunrise or sunset, with
+            its time_of_day and facing_bearing (the way along the road to look). Each of the henges
+            (in date order) has them too.
+    """
+    if road_bearing is None:
+        road_bearing = get_road_bearing(lat, lon)
+    sunset_bearing = normalize_bearing_to_180_360(road_bearing % 360)
+    bearings = {"sunrise": sunset_bearing - 180, "sunset": sunset_bearing}
+
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+    obs = Observer(lat, lon)
+
+    dates = [date + timedelta(days=i) for i in range(days + 1)]
+    horizons = dict(zip(("sunrise", "sunset"), get_sunrise_sunset_azimuths(
+        tz, obs, dates, target_altitude_deg=TARGET_ALTITUDE_DEG, engine="numpy", solver=solver
+    )))
+
+    henges = []
+    for time_of_day, horizon in horizons.items():
+        azimuths = [np.nan if az is None else az for az, _ in horizon]
+        for day_index in find_alignment_days(azimuths, bearings[time_of_day], match_threshold_deg):
+            azimuth, exact_time = horizon[day_index]
+            henges.append({
+                'henge_date': exact_time.isoformat(),
+                'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+                'henge_timezone': exact_time.tzname(),
+                'sun_angle': round(azimuth, 2),
+                'time_of_day': time_of_day,
+                'facing_bearing': round(bearings[time_of_day], 2),
+            })
+    henges.sort(key=lambda henge: datetime.fromisoformat(henge['henge_date']))
+
+    first = henges[0] if henges else {
+        'henge_date': None,
+        'henge_time_local_str': None,
+        'henge_timezone': None,
+        'sun_angle': None,
+        'time_of_day': None,
+        'facing_bearing': None,
+    }
+    return {
+        'henge_found': bool(henges),
+        **first,
+        'road_bearing': round(sunset_bearing, 2),
+        'days_searched': days,
+        'henges': henges,
+    }
+
+
+def _chunk_split(azimuths, road_bearing, match_threshold_deg, first):
+    """
+    Index at which a daily azimuth series can be cut without splitting a henge: the last day
+    (after first) that ends HENGE_MERGE_DAYS + 2 days on one side of the road, none of them within
+    match_threshold_deg of it (so no alignment on either side of the cut is merged with one on the
+    other, see find_alignment_days), or None.
+    """
+    diff = (road_bearing - np.asarray(azimuths, dtype=np.float64) + 180) % 360 - 180
+    margin = HENGE_MERGE_DAYS + 1
+    for i in range(len(diff) - 1, max(first, margin - 1), -1):
+        window = diff[i - margin:i + 1]
+        if np.all(np.isfinite(window)) and np.all(np.abs(window) >= match_threshold_deg) and (np.all(window > 0) or np.all(window < 0)):
+            return i
+    return None
+
+
+def iter_henges(
+    lat: float,
+    lon: float,
+    road_bearing: float,
+    start: datetime,
+    end: Optional[datetime] = None,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    chunk_days: int = HENGE_STREAM_CHUNK_DAYS,
+    solver: str = HORIZON_SOLVER,
+    tz: Optional[ZoneInfo] = None,
+) -> Iterator[dict]:
+    """
+    Lazily yield every henge from start on, in chronological order, for as long as the caller consumes them.
+
+    The daily azimuths are calculated chunk_days at a time, so memory stays bounded however far the
+    horizon is. Henges are found in each chunk as search_all_henges finds them; a chunk is cut on a
+    day the sun isn't near the road (and the next one starts the day before the cut), so no henge is
+    split between chunks, missed or repeated. The sun's azimuth range repeats every year, so after
+    HENGE_STREAM_MAX_GAP_DAYS without a henge there won't be any more, and the generator stops
+    (as it does where the sun never reaches the target altitude).
+
+    Args:
+        lat: latitude
+        lon: longitude
+        road_bearing: Road's bearing angle in degrees
+        start: start date of the search
+        end: Optional last date to search (searches indefinitely if not given)
+        match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
+        chunk_days: Days calculated at a time
+        solver: "binary" or "secant" (see get_horizon_azimuth)
+        tz: Timezone of the location (looked up if not given)
+
+    Yields:
+        dict with henge_date, henge_time_local_str, henge_timezone and sun_angle (as in search_all_henges)
+    """
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+    obs = Observer(lat, lon)
+    last_day = to_local_date(end, tz) if end is not None else None
+
+    chunk_start = to_local_date(start, tz)
+    skip = 0  # Leading days of the chunk already covered by the previous one
+    days = chunk_days
+    last_henge_day = chunk_start
+    while last_day is None or chunk_start <= last_day:
+        if last_day is not None:
+            days = min(days, (last_day - chunk_start).days + 1)
+        dates = [chunk_start + timedelta(days=i) for i in range(days)]
+        horizon = get_horizon_azimuths(
+            tz, obs, dates, target_altitude_deg=TARGET_ALTITUDE_DEG, engine="numpy", solver=solver
+        )
+        azimuths = [np.nan if az is None else az for az, _ in horizon]
+
+        final = last_day is not None and dates[-1] >= last_day
+        split = len(dates) if final else _chunk_split(azimuths, road_bearing, match_threshold_deg, skip)
+        if split is None and not np.all(np.isnan(azimuths)) and days < HENGE_STREAM_MAX_GAP_DAYS:
+            # The sun stays near the road for the whole chunk: take a longer one
+            days = min(days * 2, HENGE_STREAM_MAX_GAP_DAYS)
+            continue
+        if split is None:
+            # The sun never reaches the target altitude in the chunk (or it's as long as it gets): cut at its end
+            split = len(dates)
+
+        for day_index in find_alignment_days(azimuths, road_bearing, match_threshold_deg):
+            if skip <= day_index < split:
+                azimuth, exact_time = horizon[day_index]
+                last_henge_day = dates[day_index]
+                yield {
+                    'henge_date': exact_time.isoformat(),
+                    'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+                    'henge_timezone': exact_time.tzname(),
+                    'sun_angle': round(azimuth, 2),
+                }
+
+        if final or (dates[split - 1] - last_henge_day).days > HENGE_STREAM_MAX_GAP_DAYS:
+            return
+        # Carry the day before the cut over, so a crossing between it and the cut day is seen
+        chunk_start = dates[split - 1]
+        skip = 1
+        days = chunk_days
+
+
+def search_atlas_for_henge(
+    lat: float,
+    lon: float,
+    date: datetime,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    road_bearing: Optional[float] = None,
+    days: int = MAX_DAYS_TO_SEARCH,
+    refine: bool = HENGE_ATLAS_REFINE,
+    refine_days: int = HENGE_ATLAS_REFINE_DAYS,
+    tz: Optional[ZoneInfo] = None,
+):
+    """
+    Find every henge within the search window from the precomputed henge atlas (see atlas.py).
+
+    Without refine no sun positions are calculated: the crossing days and sunset times are
+    interpolated from the atlas, and sun_angle is the road bearing. Atlas dates can be a day
+    or so off, so with refine the days around each of them are checked against exact sun
+    positions (as search_all_henges would), which costs a few days of ephemeris evaluations
+    instead of a whole year.
+
+    Args:
+        lat: latitude
+        lon: longitude
+        date: start date of the search
+        match_threshold_deg: How close (in degrees) sun azimuth must be to road bearing (degrees) to be considered aligned
+        road_bearing: Road's bearing angle in degrees (looked up if not given)
+        days: Number of days to search
+        refine: Check the atlas dates against exact sun positions
+        refine_days: Days either side of each atlas date that are checked when refining
+        tz: Timezone of the location (looked up if not given)
+
+    Returns:
+        result (dict): the same fields as search_all_henges, plus approximate (bool): whether
+            the dates come straight from the atlas. None if there is no atlas, or it can't answer
+            reliably (e.g. the road is close to the sun's turning point), so an exact search is needed.
+    """
+    atlas = get_henge_atlas()
+    if atlas is None:
+        return None
+
+    if road_bearing is None:
+        road_bearing = get_road_bearing(lat, lon)
+
+    crossings = atlas.crossings(lat, road_bearing, match_threshold_deg)
+    if crossings is None:
+        return None
+
+    if tz is None:
+        tz = get_timezone_from_coordinates(lat, lon)
+    first_day = to_local_date(date, tz)
+    last_day = first_day + timedelta(days=days)
+    pad = refine_days if refine else 0
+
+    # Crossing days in each solstice-to-solstice cycle that overlaps the window
+    predicted = []
+    for year in range(first_day.year - 1, last_day.year + 1):
+        cycle_start = date_type(year, atlas.reference_start.month, atlas.reference_start.day)
+        for day, minutes in crossings:
+            henge_day = cycle_start + timedelta(days=round(day))
+            if first_day - timedelta(days=pad) <= henge_day <= last_day + timedelta(days=pad):
+                # Local mean time -> UTC: 4 minutes per degree of longitude
+                utc = datetime(henge_day.year, henge_day.month, henge_day.day, tzinfo=timezone.utc)
+                predicted.append((henge_day, utc + timedelta(minutes=minutes - 4 * lon)))
+    predicted.sort()
+
+    henges = []
+    if not refine:
+        for _, utc in predicted:
+            exact_time = utc.astimezone(tz)
+            henges.append({
+                'henge_date': exact_time.isoformat(),
+                'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+                'henge_timezone': exact_time.tzname(),
+                'sun_angle': round(road_bearing, 2),
+            })
+    else:
+        obs = Observer(lat, lon)
+        for henge_day, _ in predicted:
+            window = [henge_day + timedelta(days=i) for i in range(-pad, pad + 1)]
+            horizon = get_horizon_azimuths(tz, obs, window, target_altitude_deg=TARGET_ALTITUDE_DEG)
+            azimuths = [np.nan if az is None else az for az, _ in horizon]
+            matches = find_alignment_days(azimuths, road_bearing, match_threshold_deg)
+            if not matches:
+                return None  # the atlas was further off than refine_days
+            match = min(matches, key=lambda i: abs(i - pad))
+            azimuth, exact_time = horizon[match]
+            if first_day <= window[match] <= last_day:
+                henges.append({
+                    'henge_date': exact_time.isoformat(),
+                    'henge_time_local_str': exact_time.strftime('%Y-%m-%d %H:%M %Z'),
+                    'henge_timezone': exact_time.tzname(),
+                    'sun_angle': round(azimuth, 2),
+                })
+
+    first = henges[0] if henges else {
+        'henge_date': None,
+        'henge_time_local_str': None,
+        'henge_timezone': None,
+        'sun_angle': None,
+    }
+    return {
+        'henge_found': bool(henges),
+        **first,
+        'road_bearing': round(road_bearing, 2),
+        'days_searched': days,
+        'henges': henges,
+        'approximate': not refine,
+    }
+
 def search_daily_for_henge(
         start_date: datetime,
         end_date: datetime,
         tz: ZoneInfo,
         obs: Observer,
         road_bearing: float,
-        target_altitude_deg: float
+        target_altitude_deg: float,
+        engine: str = SOLAR_ENGINE,
     ):
     """
     Iterate every day within a specified period and check if any day is one where a henge occurs. 
+
+    With the "numpy" engine the azimuths for the whole period are calculated in one vectorized pass.
     """
+    dates = []
     curr_date = start_date
-
     while curr_date <= end_date:
-        # Get the azimuth/time for the current date
-        az_curr_date, exact_time = get_horizon_azimuth(tz, obs, curr_date, target_altitude_deg=target_altitude_deg)
+        dates.append(curr_date)
+        curr_date = curr_date + timedelta(days=1)
+
+    if engine == "numpy":
+        horizon = get_horizon_azimuths(tz, obs, dates, target_altitude_deg=target_altitude_deg, engine=engine)
+    else:
+        # Lazily, so we stop calculating once we find a match
+        horizon = (get_horizon_azimuth(tz, obs, d, target_altitude_deg=target_altitude_deg, engine=engine) for d in dates)
+
+    for az_curr_date, exact_time in horizon:
         if az_curr_date is None:
             print("Error getting azimuth for date")
-            curr_date = curr_date + timedelta(days=1)
             continue
 
         # Check if the azimuth matches the road bearing
@@ -218,8 +880,6 @@ def search_daily_for_henge(
         if henge_found:
             return henge_found, exact_time, az_curr_date
 
-        curr_date = curr_date + timedelta(days=1)
-
     # If we got here, no henge was found.
     return False, None, None
 
@@ -0,0 +1,253 @@
+"""
+Background henge lookups with a job table.
+
+A cold lookup (road network download plus a search that may evaluate a whole
+year) can take many seconds, which would tie up a web worker for as long.
+Instead, /jobs accepts a lookup, queues it on a small pool of worker threads
+and returns a job id straight away; clients poll /jobs/<id>, optionally
+long-polling with ?wait=<seconds>, until the result is in.
+
+Workers run in the server process, so jobs share the caches and single-flight
+layer with the synchronous endpoints. Submissions are refused with QueueFull
+once JOB_MAX_PENDING jobs are queued or running, so a burst gets a quick
+"try again later" instead of piling up work. Finished jobs are kept for
+JOB_RESULT_TTL_SECONDS.
+
+With several server processes (see serving.py), a poll can reach a different
+worker than the one running the job. So with JOB_DB, every job's status is
+also written to a SQLite table all workers read, and a worker asked about a
+job it isn't running answers (and long-polls) from there.
+
+Usage:
+    from jobs import get_job_queue
+
+    job = get_job_queue().submit({"address": "251 W 42nd St, New York, NY", "road_bearing": 299})
+    job.wait(30)
+    print(job.to_dict())
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from config import JOB_WORKERS, JOB_MAX_PENDING, JOB_RESULT_TTL_SECONDS, JOB_DB, JOB_POLL_INTERVAL_SECONDS, SEARCH_MODE
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while JOB_MAX_PENDING jobs are already queued or running."""
+
+    pass
+
+
+class Job:
+    """
+    One queued lookup and, once it has run, its result.
+    """
+
+    def __init__(self, item):
+        self.id = uuid.uuid4().hex
+        self.item = item
+        self.status = "queued"  # queued -> running -> done (or failed)
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None) -> bool:
+        """
+        Block until the job has finished or timeout seconds have passed. Returns whether it finished.
+        """
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        job = {'job_id': self.id, 'status': self.status}
+        if self.status == "done":
+            job['result'] = self.result
+        elif self.status == "failed":
+            job['error'] = self.error
+        return job
+
+    @classmethod
+    def from_dict(cls, job, finished=None):
+        """
+        A snapshot of a job another process is running, from its to_dict().
+        """
+        snapshot = cls(None)
+        snapshot.id = job['job_id']
+        snapshot.status = job['status']
+        snapshot.result = job.get('result')
+        snapshot.error = job.get('error')
+        snapshot.finished = finished
+        if finished is not None:
+            snapshot._done.set()
+        return snapshot
+
+
+class JobQueue:
+    """
+    Runs lookups on a thread pool and keeps a table of their jobs.
+
+    Args:
+        workers: Worker threads
+        max_pending: Most jobs queued or running at once (further submissions raise QueueFull)
+        ttl_seconds: How long finished jobs are kept
+        db_path: Optional path to a SQLite file shared with the other server processes
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl_seconds=JOB_RESULT_TTL_SECONDS, db_path=JOB_DB):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="henge-job")
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+        if db_path:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, job TEXT, created REAL, finished REAL)")
+            self._db.commit()
+
+    def _save(self, job):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (id, job, created, finished) VALUES (?, ?, ?, ?)",
+                    (job.id, json.dumps(job.to_dict()), job.created, job.finished),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            # The job still runs and can be polled from this process
+            print(f"Could not save job {job.id}: {e}")
+
+    def _load(self, job_id) -> Optional[Job]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT job, finished FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time() - self.ttl_seconds):
+            return None
+        return Job.from_dict(json.loads(row[0]), row[1])
+
+    def submit(self, item: dict, start_date: Optional[datetime] = None, mode: str = SEARCH_MODE) -> Job:
+        """
+        Queue a lookup (see batch.lookup_henge for the item format).
+
+        Raises:
+            QueueFull: if max_pending jobs are already queued or running
+        """
+        job = Job(item)
+        self._expire_saved()
+        with self._lock:
+            self._expire()
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"{self._pending} jobs are already pending")
+            self._pending += 1
+            self.submitted += 1
+            self._jobs[job.id] = job
+        self._save(job)
+        self._executor.submit(self._run, job, start_date, mode)
+        return job
+
+    def _run(self, job, start_date, mode):
+        # Imported here: batch imports the search code, which the app only needs once jobs are used
+        from batch import lookup_henge
+
+        job.status = "running"
+        self._save(job)
+        try:
+            job.result = lookup_henge(job.item, start_date, mode)
+            job.status = "done"
+        except Exception as e:
+            print(f"Error in job {job.id}: {e}")
+            job.error = 'An unexpected error occurred while processing this lookup.'
+            job.status = "failed"
+            with self._lock:
+                self.failed += 1
+        finally:
+            job.finished = time.time()
+            self._save(job)
+            with self._lock:
+                self._pending -= 1
+            job._done.set()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished is not None and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _expire_saved(self):
+        # Also drops jobs whose process died before finishing them
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute("DELETE FROM jobs WHERE COALESCE(finished, created) < ?", (time.time() - self.ttl_seconds,))
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Could not expire saved jobs: {e}")
+
+    def get(self, job_id, wait=0) -> Optional[Job]:
+        """
+        The job with this id, or None if it doesn't exist (or has expired).
+
+        Args:
+            wait: Seconds to wait for the job to finish first
+        """
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.wait(wait)
+            return job
+
+        # Running in another process (or unknown): poll the shared table
+        deadline = time.monotonic() + wait
+        job = self._load(job_id)
+        while job is not None and job.finished is None and time.monotonic() < deadline:
+            time.sleep(min(JOB_POLL_INTERVAL_SECONDS, max(deadline - time.monotonic(), 0)))
+            job = self._load(job_id)
+        return job
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'jobs': len(self._jobs),
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'failed': self.failed,
+            }
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    The shared JobQueue, started on first use.
+    """
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,236 @@
+"""
+Lightweight timing instrumentation for the lookup paths.
+
+Hot-path functions are wrapped in timed(stage), which records how long each
+call took in two places:
+
+- a process-wide latency histogram per stage, exposed with counters and the
+  cache hit rates in the Prometheus text format by render_prometheus()
+  (served at /metrics)
+- the timings of the current request, if one is being collected (see
+  collect_timings), which app.py turns into a Server-Timing header
+
+Recording is a perf_counter() call, a bisect and a few additions under a lock,
+so it's cheap enough to leave on. Timings are collected per request through a
+context variable; pipeline.py runs its stages in a copy of the request's
+context, so stages on the thread pool report into the same request.
+
+Metrics are per process: batch lookups run in worker processes (see batch.py)
+and aren't included.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS_SECONDS
+
+# Stage timings of the current request: list of (stage, seconds), or None when not collecting
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed buckets, one series per combination of label values.
+    """
+
+    def __init__(self, name, help, labels, buckets=METRICS_LATENCY_BUCKETS_SECONDS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                label = _format_labels(self.labels, label_values)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series['counts']):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+class Counter:
+    """
+    Monotonic counter, one series per combination of label values.
+    """
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, n=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + n
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_format_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+stage_seconds = Histogram("henge_stage_seconds", "Time spent in each lookup stage.", ("stage",))
+request_seconds = Histogram("henge_request_seconds", "Time spent handling each endpoint.", ("endpoint",))
+requests_total = Counter("henge_requests_total", "Requests handled, by endpoint and status.", ("endpoint", "status"))
+stage_errors_total = Counter("henge_stage_errors_total", "Lookup stages that raised, by stage.", ("stage",))
+events_total = Counter("henge_events_total", "Counted work: ephemeris evaluations, searches, search iterations.", ("event",))
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block (or, used as a decorator, every call of a function) as the given stage.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors_total.inc((stage,))
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe((stage,), elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def count(event, n=1):
+    """
+    Add n to the counter for event (e.g. "ephemeris_evaluations").
+    """
+    if METRICS_ENABLED:
+        events_total.inc((event,), n)
+
+
+def record_request(endpoint, status, seconds):
+    """
+    Count a handled request and add its duration to the endpoint's histogram.
+    """
+    if METRICS_ENABLED:
+        request_seconds.observe((endpoint,), seconds)
+        requests_total.inc((endpoint, str(status)))
+
+
+def collect_timings():
+    """
+    Start collecting stage timings for the current request.
+
+    Returns:
+        tuple (timings, token): the list timings are appended to, and the token to pass to stop_collecting
+    """
+    timings = []
+    return timings, _request_timings.set(timings)
+
+
+def stop_collecting(token):
+    _request_timings.reset(token)
+
+
+def server_timing_header(timings, total=None):
+    """
+    Format stage timings as a Server-Timing header value.
+
+    Repeated stages are summed, e.g. 'geocode;dur=212.4, search;dur=8.1;desc="3 calls", total;dur=230.2'.
+    """
+    totals = {}
+    for stage, seconds in list(timings):
+        duration, calls = totals.get(stage, (0.0, 0))
+        totals[stage] = (duration + seconds, calls + 1)
+
+    entries = []
+    for stage, (seconds, calls) in totals.items():
+        entry = f"{stage};dur={seconds * 1000:.1f}"
+        if calls > 1:
+            entry += f';desc="{calls} calls"'
+        entries.append(entry)
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def render_prometheus(caches=(), flights=(), job_queue=None):
+    """
+    All metrics in the Prometheus text exposition format.
+
+    Args:
+        caches: LRUCache instances whose hit/miss counters and hit rate are included
+        flights: SingleFlight instances whose call and deduplication counters are included
+        job_queue: JobQueue whose depth and submission counters are included
+    """
+    lines = []
+    for metric in (request_seconds, requests_total, stage_seconds, stage_errors_total, events_total):
+        lines.extend(metric.render())
+
+    cache_stats = [cache.stats() for cache in caches]
+    for field, kind, help in (
+        ("entries", "gauge", "Entries held in memory."),
+        ("hits", "counter", "Lookups answered from memory."),
+        ("disk_hits", "counter", "Lookups answered from the SQLite tier."),
+        ("misses", "counter", "Lookups that weren't cached."),
+        ("evictions", "counter", "Entries evicted from memory."),
+        ("hit_rate", "gauge", "Fraction of lookups answered from the cache."),
+    ):
+        name = f"henge_cache_{field}"
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stats in cache_stats:
+            if stats[field] is not None:
+                lines.append(f'{name}{{cache="{stats["name"]}"}} {stats[field]}')
+
+    flight_stats = [flight.stats() for flight in flights]
+    for field, kind, help in (
+        ("calls", "counter", "Calls made through the single-flight layer."),
+        ("deduplicated", "counter", "Calls that shared an identical call already in flight."),
+        ("in_flight", "gauge", "Distinct calls currently running."),
+    ):
+        name = f"henge_singleflight_{field}"
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stats in flight_stats:
+            lines.append(f'{name}{{flight="{stats["name"]}"}} {stats[field]}')
+
+    if job_queue is not None:
+        job_stats = job_queue.stats()
+        for field, kind, help in (
+            ("pending", "gauge", "Jobs queued or running."),
+            ("submitted", "counter", "Jobs accepted."),
+            ("rejected", "counter", "Jobs refused because the queue was full."),
+            ("failed", "counter", "Jobs that raised an error."),
+        ):
+            name = f"henge_jobs_{field}"
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {job_stats[field]}")
+
+    return "\n".join(lines) + "\n"
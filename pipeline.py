@@ -0,0 +1,92 @@
+"""
+Run independent lookup stages concurrently.
+
+Once an address is geocoded, the reverse geocode, the road network download
+and the timezone lookup only depend on the coordinates, so /lookup_address
+runs them side by side on a shared thread pool (they spend their time
+waiting on the network or on disk). A lookup then takes as long as its
+slowest stage rather than the sum of all of them.
+
+Stages run in a copy of the caller's context, so their timings are reported
+into the caller's request (see metrics.collect_timings).
+
+Each stage has its own timeout. When a stage fails or times out, the stages
+that haven't started yet are cancelled and StageError is raised. Threads
+can't be interrupted, so a stage that is already running finishes in the
+background and its result is discarded.
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, Dict, Optional, Tuple
+
+from config import LOOKUP_PIPELINE_THREADS, LOOKUP_STAGE_TIMEOUT_SECONDS
+
+_executor = ThreadPoolExecutor(max_workers=LOOKUP_PIPELINE_THREADS, thread_name_prefix="lookup-stage")
+
+
+class StageError(Exception):
+    """Raised when a pipeline stage fails or times out. The original exception is in `cause`."""
+
+    def __init__(self, stage: str, cause: BaseException):
+        super().__init__(f"Stage '{stage}' failed: {cause!r}")
+        self.stage = stage
+        self.cause = cause
+
+
+def _timed(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_stages(
+    stages: Dict[str, Tuple[Callable, tuple]],
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Tuple[Dict[str, object], Dict[str, float]]:
+    """
+    Run the stages concurrently and wait for all of them.
+
+    Args:
+        stages: stage name -> (function, args)
+        timeouts: stage name -> seconds (defaults to LOOKUP_STAGE_TIMEOUT_SECONDS, no limit if missing)
+
+    Returns:
+        tuple (results, durations): stage name -> return value, and stage name -> seconds taken
+
+    Raises:
+        StageError: for the first stage that raised or ran past its timeout
+    """
+    timeouts = LOOKUP_STAGE_TIMEOUT_SECONDS if timeouts is None else timeouts
+    start = time.monotonic()
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, _timed, fn, args)
+        for name, (fn, args) in stages.items()
+    }
+    deadlines = {name: start + timeouts[name] for name in stages if timeouts.get(name) is not None}
+
+    try:
+        pending = set(futures.values())
+        while pending:
+            now = time.monotonic()
+            overdue = [name for name, deadline in deadlines.items() if deadline <= now and not futures[name].done()]
+            if overdue:
+                raise StageError(overdue[0], TimeoutError(f"{overdue[0]} took longer than {timeouts[overdue[0]]}s"))
+
+            next_deadline = min((d for name, d in deadlines.items() if futures[name] in pending), default=None)
+            done, pending = wait(
+                pending,
+                timeout=None if next_deadline is None else max(next_deadline - now, 0),
+                return_when=FIRST_EXCEPTION,
+            )
+            for name, future in futures.items():
+                if future in done and future.exception() is not None:
+                    raise StageError(name, future.exception())
+    except StageError:
+        for future in futures.values():
+            future.cancel()
+        raise
+
+    results = {name: future.result()[0] for name, future in futures.items()}
+    durations = {name: future.result()[1] for name, future in futures.items()}
+    return results, durations
@@ -0,0 +1,301 @@
+"""
+Local tiled store of the road network.
+
+get_road_bearing normally downloads the road network around every address
+from Overpass. Instead, a drive network can be ingested once (from a GraphML
+file saved by osmnx, an OSM XML extract, or a place name) into fixed-size
+tiles of ROAD_TILE_SIZE_DEG degrees, and the nearest edge is then found in
+the local tiles without any network access.
+
+Each tile is an .npz file in ROAD_TILES_DIR named "<row>_<col>.npz" holding:
+    edge_ids       int64   (m, 3)  OSM ids (u, v, key) of each edge, used to merge re-ingested tiles
+    edge_nodes     float64 (m, 4)  lat/lon of both endpoints (u_lat, u_lon, v_lat, v_lon)
+    bearings       float32 (m,)    bearing from u to v (0-360), as get_road_bearing calculates it
+    segments       float32 (k, 4)  edge geometry segments (lat1, lon1, lat2, lon2), relative to the tile origin
+    segment_edge   int32   (k,)    edge index of each segment
+    cell_start     int32   (c*c+1,) spatial index: the segments overlapping cell i are
+    cell_segments  int32            cell_segments[cell_start[i]:cell_start[i + 1]]
+
+manifest.json records the tile size, the index resolution and the bounding
+boxes that were ingested, so we know which points the store can answer for.
+
+Usage:
+    python scripts/build_road_tiles.py --graphml city.graphml
+"""
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from cache import LRUCache
+from config import ROAD_TILES_DIR, ROAD_TILE_SIZE_DEG, ROAD_TILE_CELLS, ROAD_TILE_CACHE_SIZE
+from utils import calculate_bearing
+
+METERS_PER_DEG_LAT = 110540.0
+METERS_PER_DEG_LON_EQUATOR = 111320.0
+
+
+def _tile_index(lat, lon, tile_size):
+    return int(math.floor(lat / tile_size)), int(math.floor(lon / tile_size))
+
+
+def _build_cell_index(segments, tile_size, cells):
+    """
+    CSR index of which segments (relative to the tile origin) overlap each cell of a cells x cells grid.
+    """
+    cell_size = tile_size / cells
+    lat_lo = np.clip(np.floor(np.minimum(segments[:, 0], segments[:, 2]) / cell_size), 0, cells - 1).astype(int)
+    lat_hi = np.clip(np.floor(np.maximum(segments[:, 0], segments[:, 2]) / cell_size), 0, cells - 1).astype(int)
+    lon_lo = np.clip(np.floor(np.minimum(segments[:, 1], segments[:, 3]) / cell_size), 0, cells - 1).astype(int)
+    lon_hi = np.clip(np.floor(np.maximum(segments[:, 1], segments[:, 3]) / cell_size), 0, cells - 1).astype(int)
+
+    buckets = [[] for _ in range(cells * cells)]
+    for i in range(len(segments)):
+        for row in range(lat_lo[i], lat_hi[i] + 1):
+            for col in range(lon_lo[i], lon_hi[i] + 1):
+                buckets[row * cells + col].append(i)
+
+    cell_start = np.zeros(cells * cells + 1, dtype=np.int32)
+    cell_start[1:] = np.cumsum([len(b) for b in buckets])
+    cell_segments = np.array([i for b in buckets for i in b], dtype=np.int32)
+    return cell_start, cell_segments
+
+
+def _write_tile(path, origin, tile_size, cells, edge_ids, edge_nodes, segments, segment_edge):
+    """
+    Write a tile, merging with the edges already stored there (if any).
+    """
+    if os.path.exists(path):
+        existing = np.load(path)
+        old_segments = existing["segments"].astype(np.float64) + np.tile(origin, 2)
+        edge_ids = np.concatenate([existing["edge_ids"], edge_ids])
+        edge_nodes = np.concatenate([existing["edge_nodes"], edge_nodes])
+        segments = np.concatenate([old_segments, segments])
+        segment_edge = np.concatenate([existing["segment_edge"], segment_edge + len(existing["edge_ids"])])
+
+        # Keep the first copy of each edge
+        _, keep = np.unique(edge_ids, axis=0, return_index=True)
+        keep = np.sort(keep)
+        remap = np.full(len(edge_ids), -1)
+        remap[keep] = np.arange(len(keep))
+        edge_ids, edge_nodes = edge_ids[keep], edge_nodes[keep]
+        kept_segments = remap[segment_edge] >= 0
+        segments, segment_edge = segments[kept_segments], remap[segment_edge[kept_segments]]
+
+    relative = (segments - np.tile(origin, 2)).astype(np.float32)
+    cell_start, cell_segments = _build_cell_index(relative, tile_size, cells)
+    bearings = calculate_bearing(edge_nodes[:, 0], edge_nodes[:, 1], edge_nodes[:, 2], edge_nodes[:, 3])
+
+    np.savez(
+        path,
+        edge_ids=edge_ids.astype(np.int64),
+        edge_nodes=edge_nodes.astype(np.float64),
+        bearings=bearings.astype(np.float32),
+        segments=relative,
+        segment_edge=segment_edge.astype(np.int32),
+        cell_start=cell_start,
+        cell_segments=cell_segments,
+    )
+
+
+def ingest_graph(G, tiles_dir=ROAD_TILES_DIR, tile_size=ROAD_TILE_SIZE_DEG, cells=ROAD_TILE_CELLS, network_type="drive"):
+    """
+    Split an (unprojected) osmnx graph into tiles in tiles_dir.
+
+    Reverse duplicates of two-way edges are dropped, since they have the same
+    geometry and (after normalizing to 180-360) the same bearing.
+
+    Returns:
+        Number of tiles written
+    """
+    os.makedirs(tiles_dir, exist_ok=True)
+    manifest_path = os.path.join(tiles_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["tile_size"] != tile_size or manifest["cells"] != cells:
+            raise ValueError("Tile size/cells don't match the existing store; use a new directory.")
+    else:
+        manifest = {"tile_size": tile_size, "cells": cells, "network_type": network_type, "bboxes": []}
+
+    # tile -> lists of (edge id, endpoints, segments)
+    tiles = {}
+    seen = set()
+    for u, v, key, data in G.edges(keys=True, data=True):
+        if (v, u, key) in seen:
+            continue
+        seen.add((u, v, key))
+
+        endpoints = (G.nodes[u]["y"], G.nodes[u]["x"], G.nodes[v]["y"], G.nodes[v]["x"])
+        if "geometry" in data:
+            points = [(y, x) for x, y in data["geometry"].coords]
+        else:
+            points = [endpoints[:2], endpoints[2:]]
+
+        for (lat_1, lon_1), (lat_2, lon_2) in zip(points[:-1], points[1:]):
+            row_lo, col_lo = _tile_index(min(lat_1, lat_2), min(lon_1, lon_2), tile_size)
+            row_hi, col_hi = _tile_index(max(lat_1, lat_2), max(lon_1, lon_2), tile_size)
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    tile = tiles.setdefault((row, col), {"edges": {}, "segments": [], "segment_edge": []})
+                    edge_index = tile["edges"].setdefault((u, v, key), (len(tile["edges"]), endpoints))[0]
+                    tile["segments"].append((lat_1, lon_1, lat_2, lon_2))
+                    tile["segment_edge"].append(edge_index)
+
+    for (row, col), tile in tiles.items():
+        edges = sorted(tile["edges"].items(), key=lambda item: item[1][0])
+        _write_tile(
+            os.path.join(tiles_dir, f"{row}_{col}.npz"),
+            np.array([row * tile_size, col * tile_size]),
+            tile_size,
+            cells,
+            np.array([edge_id for edge_id, _ in edges], dtype=np.int64).reshape(-1, 3),
+            np.array([endpoints for _, (_, endpoints) in edges], dtype=np.float64).reshape(-1, 4),
+            np.array(tile["segments"], dtype=np.float64).reshape(-1, 4),
+            np.array(tile["segment_edge"], dtype=np.int32),
+        )
+
+    lats = [d["y"] for _, d in G.nodes(data=True)]
+    lons = [d["x"] for _, d in G.nodes(data=True)]
+    if lats:
+        manifest["bboxes"].append([min(lats), min(lons), max(lats), max(lons)])
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    return len(tiles)
+
+
+class RoadStore:
+    """
+    Nearest-edge lookups against the tiles in tiles_dir.
+
+    Tiles are loaded lazily and kept in an LRU of ROAD_TILE_CACHE_SIZE tiles.
+    """
+
+    def __init__(self, tiles_dir=ROAD_TILES_DIR, max_tiles=ROAD_TILE_CACHE_SIZE):
+        self.tiles_dir = tiles_dir
+        with open(os.path.join(tiles_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.tile_size = manifest["tile_size"]
+        self.cells = manifest["cells"]
+        self.network_type = manifest.get("network_type", "drive")
+        self.bboxes = manifest["bboxes"]
+        self._tiles = LRUCache("road_tiles", max_entries=max_tiles)
+
+    def covers(self, lat, lon, network_type="drive"):
+        """
+        Whether the point is inside an ingested area (so the store can answer for it).
+        """
+        if network_type != self.network_type:
+            return False
+        return any(s <= lat <= n and w <= lon <= e for s, w, n, e in self.bboxes)
+
+    def preload(self):
+        """
+        Load ingested tiles into memory (as many as the tile cache holds), e.g. before forking workers.
+
+        Returns:
+            int: tiles loaded
+        """
+        names = sorted(name for name in os.listdir(self.tiles_dir) if name.endswith(".npz"))
+        for name in names[:self._tiles.max_entries]:
+            row, col = (int(part) for part in name[:-len(".npz")].split("_"))
+            self._tile(row, col)
+        return min(len(names), self._tiles.max_entries)
+
+    def _tile(self, row, col):
+        tile = self._tiles.get((row, col))
+        if tile is None:
+            path = os.path.join(self.tiles_dir, f"{row}_{col}.npz")
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    tile = {name: data[name] for name in data.files}
+            else:
+                tile = {}  # no roads here
+            self._tiles.set((row, col), tile)
+        return tile
+
+    def nearest_edge(self, lat, lon, dist):
+        """
+        Find the edge closest to the point, within dist meters.
+
+        Returns:
+            tuple (bearing, distance_m, edge_nodes), bearing from u to v in 0-360
+
+        Raises:
+            ValueError: if there is no road within dist meters
+        """
+        meters_per_deg_lon = METERS_PER_DEG_LON_EQUATOR * math.cos(math.radians(lat))
+        dlat = dist / METERS_PER_DEG_LAT
+        dlon = dist / meters_per_deg_lon
+        cell_size = self.tile_size / self.cells
+
+        best = (math.inf, None, None)
+        row_lo, col_lo = _tile_index(lat - dlat, lon - dlon, self.tile_size)
+        row_hi, col_hi = _tile_index(lat + dlat, lon + dlon, self.tile_size)
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                tile = self._tile(row, col)
+                if not tile:
+                    continue
+                origin_lat, origin_lon = row * self.tile_size, col * self.tile_size
+
+                # Segments in the cells overlapping the search box
+                c_row_lo = max(int((lat - dlat - origin_lat) // cell_size), 0)
+                c_row_hi = min(int((lat + dlat - origin_lat) // cell_size), self.cells - 1)
+                c_col_lo = max(int((lon - dlon - origin_lon) // cell_size), 0)
+                c_col_hi = min(int((lon + dlon - origin_lon) // cell_size), self.cells - 1)
+                starts, ends = tile["cell_start"][:-1], tile["cell_start"][1:]
+                candidates = [
+                    tile["cell_segments"][starts[c]:ends[c]]
+                    for r in range(c_row_lo, c_row_hi + 1)
+                    for c in range(r * self.cells + c_col_lo, r * self.cells + c_col_hi + 1)
+                ]
+                if not candidates:
+                    continue
+                candidates = np.unique(np.concatenate(candidates))
+                if len(candidates) == 0:
+                    continue
+
+                # Point to segment distance, in a local flat projection (meters) around the point
+                seg = tile["segments"][candidates].astype(np.float64)
+                y1 = (seg[:, 0] + origin_lat - lat) * METERS_PER_DEG_LAT
+                x1 = (seg[:, 1] + origin_lon - lon) * meters_per_deg_lon
+                y2 = (seg[:, 2] + origin_lat - lat) * METERS_PER_DEG_LAT
+                x2 = (seg[:, 3] + origin_lon - lon) * meters_per_deg_lon
+                dx, dy = x2 - x1, y2 - y1
+                length_sq = dx * dx + dy * dy
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    t = np.clip(np.where(length_sq > 0, -(x1 * dx + y1 * dy) / length_sq, 0.0), 0.0, 1.0)
+                distances = np.hypot(x1 + t * dx, y1 + t * dy)
+
+                i = int(np.argmin(distances))
+                if distances[i] < best[0]:
+                    edge = tile["segment_edge"][candidates[i]]
+                    best = (float(distances[i]), float(tile["bearings"][edge]), tile["edge_nodes"][edge])
+
+        distance, bearing, edge_nodes = best
+        if bearing is None or distance > dist:
+            raise ValueError(f"No road found within {dist} m of ({lat}, {lon})")
+        return bearing, distance, edge_nodes
+
+    def stats(self):
+        return self._tiles.stats()
+
+
+_road_store = None
+_road_store_lock = threading.Lock()
+
+
+def get_road_store():
+    """
+    The shared RoadStore, or None if no tiles have been ingested into ROAD_TILES_DIR.
+    """
+    global _road_store
+    if _road_store is None and ROAD_TILES_DIR and os.path.exists(os.path.join(ROAD_TILES_DIR, "manifest.json")):
+        with _road_store_lock:
+            if _road_store is None:
+                _road_store = RoadStore(ROAD_TILES_DIR)
+    return _road_store
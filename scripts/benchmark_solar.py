@@ -0,0 +1,249 @@
+"""
+Benchmark the solar and henge search hot paths.
+
+Times get_horizon_azimuth, _binary_search, search_for_henge (a henge today, a
+henge late in the window and no henge at all, in each search mode),
+search_daily_for_henge and calculate_sun_azimuths_for_year for every city in
+CITIES (see plots.py), and counts the daily sun azimuth calculations
+(ephemeris evaluations) each call needs.
+
+Runs offline: timezones come from the fixtures below, road bearings are
+derived from each city's azimuth curve, and geocoding, OSM downloads and
+outbound connections are blocked, so any call that would need the network
+fails instead of skewing the timings. The azimuth curve and search result
+caches are kept in memory only, so the benchmark neither reads nor wipes the
+server's SQLite files.
+
+Results are written as JSON so runs can be compared between commits:
+
+Usage:
+    python scripts/benchmark_solar.py --output before.json
+    python scripts/benchmark_solar.py --output after.json --compare before.json
+    python scripts/benchmark_solar.py --repeats 10 --cities "NYC, USA"
+"""
+import sys
+import os
+import argparse
+import json
+import platform
+import socket
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from astral import Observer, sun
+
+import utils
+import hengefinder
+import sunset_calculator
+from cache import LRUCache
+from utils import get_horizon_azimuth, get_horizon_azimuths, find_alignment_days, count_ephemeris_evaluations, _binary_search
+from hengefinder import search_for_henge, search_daily_for_henge
+from sunset_calculator import calculate_sun_azimuths_for_year
+from config import TARGET_ALTITUDE_DEG, SEARCH_WINDOW_MINUTES, MAX_DAYS_TO_SEARCH, SOLAR_ENGINE, HORIZON_SOLVER, SEARCH_MODE
+from plots import CITIES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixed start date, so every run computes the same days
+START_DATE = datetime(2026, 1, 1, tzinfo=ZoneInfo("UTC"))
+
+# Timezones of CITIES, instead of TimezoneFinder
+CITY_TIMEZONES = {
+    "Quito, Ecuador": "America/Guayaquil",
+    "Miami, USA": "America/New_York",
+    "NYC, USA": "America/New_York",
+    "London, UK": "Europe/London",
+    "Oslo, Norway": "Europe/Oslo",
+}
+
+SEARCH_MODES = ["coarse", "adaptive", "all", "atlas", "both"]
+ENGINES = ["numpy", "astral"]
+DAILY_WINDOW_DAYS = 30  # Days covered by each search_daily_for_henge call
+
+
+def fixture_timezone(lat, lon):
+    """Timezone of the fixture city closest to (lat, lon)"""
+    city = min(CITIES, key=lambda c: (CITIES[c][0] - lat) ** 2 + (CITIES[c][1] - lon) ** 2)
+    return ZoneInfo(CITY_TIMEZONES[city])
+
+
+def no_network(*args, **kwargs):
+    raise OSError("network access during benchmark")
+
+
+def go_offline():
+    """
+    Replace timezone lookups with the fixtures, block geocoding, OSM and outbound connections,
+    and swap the disk-backed result caches for memory-only ones
+    """
+    utils.get_timezone_from_coordinates = fixture_timezone
+    sunset_calculator.get_timezone_from_coordinates = fixture_timezone
+    utils._get_geolocator = no_network
+    socket.socket.connect = no_network
+    socket.create_connection = no_network
+    hengefinder.henge_result_cache = LRUCache("henge_results", max_entries=hengefinder.henge_result_cache.max_entries)
+    sunset_calculator.azimuth_cache = LRUCache("azimuth_curves", max_entries=sunset_calculator.azimuth_cache.max_entries)
+
+
+def bearing_cases(lat, lon, tz):
+    """
+    Road bearings for the search cases at a city, from its azimuth curve.
+
+    Returns:
+        dict: case name -> road bearing ("hit_today", "hit_late" and "no_henge")
+    """
+    obs = Observer(lat, lon)
+    dates = [START_DATE + timedelta(days=i) for i in range(MAX_DAYS_TO_SEARCH + 1)]
+    azimuths = np.array([np.nan if az is None else az for az, _ in get_horizon_azimuths(tz, obs, dates, TARGET_ALTITUDE_DEG)])
+
+    # The latest first henge in the window: a bearing only reached once the sun has turned around
+    late_day = max(
+        (day for day in range(len(azimuths)) if np.isfinite(azimuths[day])),
+        key=lambda day: (find_alignment_days(azimuths, azimuths[day]) or [day])[0],
+    )
+    return {
+        "hit_today": float(azimuths[0]),
+        "hit_late": float(azimuths[late_day]),
+        "no_henge": float(np.nanmax(azimuths) + 5),
+    }
+
+
+def measure(fn, repeats, setup=None):
+    """
+    Time fn() repeats times (after one warm-up call). setup(), if given, runs untimed before each call.
+
+    Returns:
+        dict with the median and min seconds per call, calls per second and ephemeris evaluations per call
+    """
+    if setup is not None:
+        setup()
+    fn()
+    seconds = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        with count_ephemeris_evaluations() as counter:
+            start = time.perf_counter()
+            fn()
+            seconds.append(time.perf_counter() - start)
+    median = statistics.median(seconds)
+    return {
+        "median_seconds": median,
+        "min_seconds": min(seconds),
+        "calls_per_second": 1 / median if median > 0 else None,
+        "ephemeris_evaluations": counter["evaluations"],
+    }
+
+
+def benchmark_city(city, repeats):
+    lat, lon = CITIES[city]
+    tz = fixture_timezone(lat, lon)
+    obs = Observer(lat, lon)
+    day = START_DATE + timedelta(days=100)
+    results = []
+
+    def record(name, fn, setup=None, **params):
+        result = {"name": name, "city": city, "params": params, **measure(fn, repeats, setup)}
+        results.append(result)
+        print(f"{name:34} {city:16} {json.dumps(params):44} {result['median_seconds'] * 1000:9.3f} ms  {result['ephemeris_evaluations']:4} evals")
+
+    for engine in ENGINES:
+        record("get_horizon_azimuth", lambda: get_horizon_azimuth(tz, obs, day, TARGET_ALTITUDE_DEG, engine=engine), engine=engine)
+
+    sunset = sun.sun(obs, day.astimezone(tz).date(), tzinfo=tz)["sunset"]
+    record("_binary_search", lambda: _binary_search(-SEARCH_WINDOW_MINUTES, 1, TARGET_ALTITUDE_DEG, sunset, obs, "sunset"))
+
+    for case, bearing in bearing_cases(lat, lon, tz).items():
+        for mode in SEARCH_MODES:
+            record(
+                "search_for_henge",
+                lambda: search_for_henge(lat, lon, START_DATE, road_bearing=bearing, mode=mode, tz=tz),
+                setup=hengefinder.henge_result_cache.clear,
+                case=case, mode=mode, road_bearing=round(bearing, 2),
+            )
+        record(
+            "search_daily_for_henge",
+            lambda: search_daily_for_henge(START_DATE, START_DATE + timedelta(days=DAILY_WINDOW_DAYS), tz, obs, bearing, TARGET_ALTITUDE_DEG),
+            case=case, days=DAILY_WINDOW_DAYS, road_bearing=round(bearing, 2),
+        )
+
+    for engine in ENGINES:
+        record(
+            "calculate_sun_azimuths_for_year",
+            lambda: calculate_sun_azimuths_for_year(lat, lon, start_date=START_DATE.date(), target_altitude_deg=TARGET_ALTITUDE_DEG, engine=engine),
+            setup=sunset_calculator.azimuth_cache.clear,
+            engine=engine,
+        )
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result):
+    return (result["name"], result["city"], json.dumps(result["params"], sort_keys=True))
+
+
+def compare(results, baseline_path):
+    """Print the speedup of each benchmark against a previous run"""
+    with open(baseline_path) as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+
+    print(f"\nCompared to {baseline_path} (speedup = old median / new median):")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        speedup = old["median_seconds"] / result["median_seconds"] if result["median_seconds"] > 0 else float("inf")
+        evals = f"{old['ephemeris_evaluations']} -> {result['ephemeris_evaluations']} evals"
+        print(f"{result['name']:34} {result['city']:16} {json.dumps(result['params']):44} {speedup:6.2f}x  {evals}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed calls per benchmark")
+    parser.add_argument("--cities", nargs="+", default=list(CITIES), choices=list(CITIES))
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    go_offline()
+
+    results = []
+    for city in args.cities:
+        results.extend(benchmark_city(city, args.repeats))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "timestamp": datetime.now(ZoneInfo("UTC")).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "config": {
+                "SOLAR_ENGINE": SOLAR_ENGINE,
+                "HORIZON_SOLVER": HORIZON_SOLVER,
+                "SEARCH_MODE": SEARCH_MODE,
+                "MAX_DAYS_TO_SEARCH": MAX_DAYS_TO_SEARCH,
+            },
+            "start_date": START_DATE.date().isoformat(),
+            "repeats": args.repeats,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark application startup.
+
+Imports app.py in fresh interpreters with outbound network connections
+blocked, and reports how long the import and the first request take. Fails
+if startup touches the network, imports one of the heavy dependencies
+(which should only be imported on first use), or is slower than --max-seconds.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --runs 10 --max-seconds 1.0
+"""
+import sys
+import os
+import argparse
+import json
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["osmnx", "geopandas", "networkx", "matplotlib", "geopy", "timezonefinder"]
+
+# Run in a fresh interpreter: block the network, then time the import and the first request
+PROBE = """
+import json, socket, sys, time
+
+def no_network(*args, **kwargs):
+    raise OSError("network access during startup")
+socket.socket.connect = no_network
+socket.create_connection = no_network
+
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+response = app.app.test_client().post("/lookup_azimuth_altitude", json={"time": "2026-05-29T00:12:00Z"})
+t2 = time.perf_counter()
+
+print(json.dumps({
+    "import_seconds": t1 - t0,
+    "first_request_seconds": t2 - t1,
+    "status": response.status_code,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="Fail if the median import takes longer")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_seconds = statistics.median(r["import_seconds"] for r in runs)
+    request_seconds = statistics.median(r["first_request_seconds"] for r in runs)
+    print(f"import app: median {import_seconds * 1000:.0f} ms over {args.runs} runs")
+    print(f"first request: median {request_seconds * 1000:.0f} ms")
+
+    ok = True
+    if any(r["status"] != 200 for r in runs):
+        print(f"First request failed: {[r['status'] for r in runs]}")
+        ok = False
+    heavy = sorted({m for r in runs for m in r["heavy_modules"]})
+    if heavy:
+        print(f"Imported at startup (should be lazy): {', '.join(heavy)}")
+        ok = False
+    if import_seconds > args.max_seconds:
+        print(f"Startup is slower than {args.max_seconds}s!")
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Build the henge atlas used by the "atlas" search mode (see atlas.py).
+
+Usage:
+    python scripts/build_henge_atlas.py
+    python scripts/build_henge_atlas.py --lat-step 0.5 --bearing-step 0.2 --path data/henge_atlas.npy
+"""
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from atlas import HengeAtlas
+from config import HENGE_ATLAS_PATH, HENGE_ATLAS_MAX_LAT, HENGE_ATLAS_LAT_STEP_DEG, HENGE_ATLAS_BEARING_STEP_DEG, TARGET_ALTITUDE_DEG
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=HENGE_ATLAS_PATH)
+    parser.add_argument("--max-lat", type=float, default=HENGE_ATLAS_MAX_LAT)
+    parser.add_argument("--lat-step", type=float, default=HENGE_ATLAS_LAT_STEP_DEG)
+    parser.add_argument("--bearing-step", type=float, default=HENGE_ATLAS_BEARING_STEP_DEG)
+    parser.add_argument("--target-altitude-deg", type=float, default=TARGET_ALTITUDE_DEG)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    HengeAtlas.build(args.path, args.max_lat, args.lat_step, args.bearing_step, args.target_altitude_deg)
+    atlas = HengeAtlas(args.path)
+    size_mb = os.path.getsize(args.path) / 1e6
+    print(f"Built {atlas.table.shape[0]} latitudes x {atlas.table.shape[1]} bearings into {args.path} ({size_mb:.1f} MB, {time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Ingest a drive network into the local road tiles used by get_road_bearing (see road_store.py).
+
+Usage:
+    python scripts/build_road_tiles.py --graphml city.graphml
+    python scripts/build_road_tiles.py --osm-xml extract.osm
+    python scripts/build_road_tiles.py --place "Manhattan, New York, USA"
+
+PBF extracts can be converted to OSM XML first, e.g. with osmium-tool:
+    osmium cat extract.osm.pbf -o extract.osm
+"""
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import osmnx as ox
+
+from config import ROAD_TILES_DIR
+from road_store import ingest_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--graphml", help="GraphML file saved by osmnx (ox.save_graphml)")
+    source.add_argument("--osm-xml", help="OSM XML extract")
+    source.add_argument("--place", help="Place name to download once from OSM")
+    parser.add_argument("--tiles-dir", default=ROAD_TILES_DIR)
+    parser.add_argument("--network-type", default="drive")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.graphml:
+        G = ox.load_graphml(args.graphml)
+    elif args.osm_xml:
+        G = ox.graph_from_xml(args.osm_xml, retain_all=True)
+    else:
+        G = ox.graph_from_place(args.place, network_type=args.network_type, retain_all=True)
+
+    n_tiles = ingest_graph(G, tiles_dir=args.tiles_dir, network_type=args.network_type)
+    print(f"Ingested {len(G.edges)} edges into {n_tiles} tiles in {args.tiles_dir} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Stream the henges at a street, in chronological order, as NDJSON or an iCalendar feed.
+
+Without --end or --count the events keep coming for as long as the output is
+read (e.g. pipe into head), computed a year at a time (see hengefinder.iter_henges).
+
+Usage:
+    python scripts/henge_events.py --address "211 E 43rd St, NYC" --count 10
+    python scripts/henge_events.py --lat 40.7505 --lon -73.9934 --road-bearing 299 --end 2050-12-31 --format ics > henges.ics
+    python scripts/henge_events.py --lat 40.7505 --lon -73.9934 --road-bearing 299 | head -n 100
+"""
+import sys
+import os
+import argparse
+import json
+from datetime import date, datetime, time
+from itertools import islice
+from zoneinfo import ZoneInfo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_feed import henge_calendar
+from hengefinder import iter_henges
+from utils import check_latitude, get_coordinates, get_location, get_road_bearing, get_utc_start_date, normalize_bearing_to_180_360
+
+
+def utc_midnight(day: str) -> datetime:
+    return datetime.combine(date.fromisoformat(day), time(), tzinfo=ZoneInfo("UTC"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address")
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lon", type=float)
+    parser.add_argument("--road-bearing", type=float, help="Looked up from the road network if not given")
+    parser.add_argument("--start", help="First day (YYYY-MM-DD, default today)")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--count", type=int, help="Number of henges")
+    parser.add_argument("--format", choices=["ndjson", "ics"], default="ndjson")
+    args = parser.parse_args()
+    if args.count is not None and args.count < 0:
+        parser.error("--count must not be negative")
+
+    if args.address:
+        lat, lon = get_coordinates(get_location(args.address))
+    elif args.lat is not None and args.lon is not None:
+        lat, lon = args.lat, args.lon
+    else:
+        parser.error("give --address or --lat and --lon")
+    check_latitude(lat)
+
+    road_bearing = normalize_bearing_to_180_360(args.road_bearing) if args.road_bearing is not None else get_road_bearing(lat, lon)
+    start = utc_midnight(args.start) if args.start else get_utc_start_date()
+    end = utc_midnight(args.end) if args.end else None
+    events = islice(iter_henges(lat, lon, road_bearing, start, end), args.count)
+
+    try:
+        if args.format == "ics":
+            for line in henge_calendar(events, lat, lon, road_bearing):
+                sys.stdout.write(line)
+        else:
+            for event in events:
+                print(json.dumps(event), flush=True)
+    except BrokenPipeError:
+        # The reader (e.g. head) has had enough; keep Python from complaining while flushing stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Validate the vectorized solar engine (solar.py) against astral.
+
+For each city, computes a year of horizon azimuths with both engines and
+reports the largest azimuth/time differences and the speedup.
+
+Usage:
+    python scripts/validate_solar.py
+"""
+import sys
+import os
+import time
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from astral import Observer, sun
+
+from utils import get_horizon_azimuths, get_timezone_from_coordinates
+from solar import sun_position, datetimes_to_epoch
+from plots import CITIES
+
+MAX_AZIMUTH_DIFF_DEG = 0.05  # A minute of sun motion is ~0.2 degrees, so this allows for the odd boundary minute
+
+
+def compare_positions(lat, lon, start, n=500):
+    """
+    Largest elevation/azimuth difference between engines at random instants.
+    """
+    rng = np.random.default_rng(0)
+    obs = Observer(lat, lon)
+    times = [start + timedelta(seconds=int(s)) for s in rng.integers(0, 365 * 86400, n)]
+    elevation, azimuth = sun_position(lat, lon, datetimes_to_epoch(times))
+
+    ref_el = np.array([sun.elevation(obs, t) for t in times])
+    ref_az = np.array([sun.azimuth(obs, t) for t in times])
+    az_diff = np.abs((azimuth - ref_az + 180) % 360 - 180)
+    return np.max(np.abs(elevation - ref_el)), np.max(az_diff)
+
+
+def compare_year(lat, lon, start_date, time_of_day):
+    """
+    Compare a year of horizon azimuths between engines.
+    """
+    tz = get_timezone_from_coordinates(lat, lon)
+    obs = Observer(lat, lon)
+    dates = [datetime.combine(start_date, datetime.min.time(), tzinfo=tz) + timedelta(days=i) for i in range(365)]
+
+    t0 = time.perf_counter()
+    reference = get_horizon_azimuths(tz, obs, dates, time_of_day=time_of_day, engine="astral")
+    t1 = time.perf_counter()
+    vectorized = get_horizon_azimuths(tz, obs, dates, time_of_day=time_of_day, engine="numpy")
+    t2 = time.perf_counter()
+
+    max_az = 0.0
+    max_seconds = 0.0
+    for (ref_az, ref_time), (az, exact_time) in zip(reference, vectorized):
+        # astral's sun.sun() also needs dawn/dusk, so near the latitude limit it
+        # can fail on days that do have a sunset. Only compare days both engines have.
+        if ref_az is None or az is None:
+            continue
+        max_az = max(max_az, abs(ref_az - az))
+        max_seconds = max(max_seconds, abs((ref_time - exact_time).total_seconds()))
+
+    return max_az, max_seconds, t1 - t0, t2 - t1
+
+
+def main():
+    start = date(2026, 1, 1)
+    ok = True
+    for city, (lat, lon) in CITIES.items():
+        el_diff, az_diff = compare_positions(lat, lon, datetime(2026, 1, 1))
+        print(f"{city}: max elevation diff {el_diff:.2e}°, max azimuth diff {az_diff:.2e}°")
+        for time_of_day in ("sunset", "sunrise"):
+            max_az, max_seconds, t_astral, t_numpy = compare_year(lat, lon, start, time_of_day)
+            print(
+                f"  {time_of_day}: max azimuth diff {max_az:.4f}°, max time diff {max_seconds:.0f}s, "
+                f"astral {t_astral:.2f}s, numpy {t_numpy:.3f}s ({t_astral / t_numpy:.0f}x)"
+            )
+            ok = ok and max_az < MAX_AZIMUTH_DIFF_DEG
+    if not ok:
+        print("Vectorized engine does not match astral!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Production serving with several worker processes.
+
+python app.py runs Flask's development server in one process. In production,
+gunicorn (configured in gunicorn.conf.py) builds the app once in its master
+process with create_app and forks SERVER_WORKERS workers from it, so requests
+run in parallel on every CPU instead of queueing behind one interpreter.
+
+preload_shared_data runs in the master before the fork, so the workers share
+what it loads copy-on-write instead of each warming its own copy:
+    - the ephemeris table and henge atlas (read-only memory-mapped files)
+    - the timezone polygons, and the timezone cells memoized so far
+    - the local road network tiles
+    - the azimuth curves, search results and geocoding results in the SQLite
+      tier of their caches
+The loaded objects are then frozen out of the garbage collector (gc.freeze),
+so collections in the workers don't write to, and so copy, the shared pages.
+
+What the workers compute after the fork is written to the same SQLite tiers,
+which every worker reads: a curve or address one worker computed is a disk
+hit for the others. Metrics (/metrics) and single-flight are per worker.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+"""
+import gc
+import time
+
+from cache import reopen_databases
+
+
+def preload_shared_data():
+    """
+    Load the read-mostly data every worker needs. Returns what was loaded, for the startup log.
+    """
+    # Imported here so gunicorn.conf.py can import this module before the app is loaded
+    from atlas import get_henge_atlas
+    from hengefinder import henge_result_cache
+    from road_store import get_road_store
+    from solar import get_ephemeris_table
+    from sunset_calculator import azimuth_cache
+    from timezones import get_timezone_resolver
+    from utils import geocode_cache, geocode_failure_cache
+
+    start = time.perf_counter()
+    loaded = {
+        'ephemeris_table': get_ephemeris_table() is not None,
+        'henge_atlas': get_henge_atlas() is not None,
+    }
+
+    get_timezone_resolver().preload()
+    road_store = get_road_store()
+    loaded['road_tiles'] = road_store.preload() if road_store is not None else 0
+    for cache in (azimuth_cache, henge_result_cache, geocode_cache, geocode_failure_cache):
+        loaded[cache.name] = cache.preload()
+
+    gc.collect()
+    gc.freeze()
+    loaded['seconds'] = round(time.perf_counter() - start, 2)
+    return loaded
+
+
+def after_fork():
+    """
+    Set up a freshly forked worker.
+    """
+    # SQLite connections must not be used across a fork, so each worker opens its own
+    reopen_databases()
@@ -0,0 +1,529 @@
+"""
+Vectorized solar position calculations.
+
+These are the same NOAA formulas astral uses (see astral.sun), rewritten to
+work on NumPy arrays of timestamps so a whole year of sunsets, or a whole
+search window of altitude probes, can be evaluated in one pass instead of
+one Python call per timestamp. astral remains the reference implementation;
+see scripts/validate_solar.py for the comparison.
+
+Timestamps are POSIX epoch seconds (UTC) as float64 arrays. Latitude and
+longitude may be scalars or arrays and broadcast against the timestamps,
+so several observers can be evaluated at once.
+
+The observer-independent quantities (declination, equation of time) come
+from a shared, memory-mapped EphemerisTable when one is available, which
+leaves a few trig operations per observer and timestamp.
+"""
+import math
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from astral import refraction_at_zenith
+
+from config import (
+    EPHEMERIS_TABLE_PATH,
+    EPHEMERIS_TABLE_START_YEAR,
+    EPHEMERIS_TABLE_END_YEAR,
+    EPHEMERIS_TABLE_STEP_MINUTES,
+)
+
+# Using 32 arc minutes as sun's apparent diameter (matches astral)
+SUN_APPARENT_RADIUS = 32.0 / (60.0 * 2.0)
+SUNRISE_SUNSET_ZENITH = 90.0 + SUN_APPARENT_RADIUS
+
+SECONDS_PER_DAY = 86400.0
+JULIAN_DAY_UNIX_EPOCH = 2440587.5
+JULIAN_DAY_J2000 = 2451545.0
+
+_UTC = timezone.utc
+
+
+def datetimes_to_epoch(times) -> np.ndarray:
+    """
+    Convert a datetime (or an iterable of datetimes) to epoch seconds.
+
+    Naive datetimes are assumed to be in UTC, as in astral.
+    """
+    if isinstance(times, datetime):
+        times = [times]
+    return np.array(
+        [(t if t.tzinfo is not None else t.replace(tzinfo=_UTC)).timestamp() for t in times],
+        dtype=np.float64,
+    )
+
+
+def epoch_to_datetime(epoch_seconds: float, tz: ZoneInfo) -> datetime:
+    """
+    Convert epoch seconds back to an aware datetime in the given timezone.
+    """
+    return datetime.fromtimestamp(float(epoch_seconds), tz)
+
+
+def julian_century(epoch_seconds) -> np.ndarray:
+    """
+    Julian century (since J2000) for the given epoch seconds.
+    """
+    jd = np.asarray(epoch_seconds, dtype=np.float64) / SECONDS_PER_DAY + JULIAN_DAY_UNIX_EPOCH
+    return (jd - JULIAN_DAY_J2000) / 36525.0
+
+
+def declination_and_equation_of_time(jc) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sun's declination (degrees) and equation of time (minutes) for Julian centuries.
+
+    These only depend on the instant, not on the observer.
+    """
+    jc = np.asarray(jc, dtype=np.float64)
+
+    l0 = (280.46646 + jc * (36000.76983 + 0.0003032 * jc)) % 360.0
+    m = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+    e = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+
+    mrad = np.radians(m)
+    c = (
+        np.sin(mrad) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mrad) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mrad) * 0.000289
+    )
+    true_long = l0 + c
+
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = true_long - 0.00569 - 0.00478 * np.sin(omega)
+
+    seconds = 21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))
+    mean_obliquity = 23.0 + (26.0 + seconds / 60.0) / 60.0
+    obliquity = mean_obliquity + 0.00256 * np.cos(omega)
+
+    declination = np.degrees(
+        np.arcsin(np.sin(np.radians(obliquity)) * np.sin(np.radians(apparent_long)))
+    )
+
+    y = np.tan(np.radians(obliquity) / 2.0) ** 2
+    l0rad = np.radians(l0)
+    eqtime = (
+        y * np.sin(2.0 * l0rad)
+        - 2.0 * e * np.sin(mrad)
+        + 4.0 * e * y * np.sin(mrad) * np.cos(2.0 * l0rad)
+        - 0.5 * y * y * np.sin(4.0 * l0rad)
+        - 1.25 * e * e * np.sin(2.0 * mrad)
+    )
+
+    return declination, np.degrees(eqtime) * 4.0
+
+
+class EphemerisTable:
+    """
+    Precomputed solar declination and equation of time on a regular time grid.
+
+    Both only depend on the instant, not on the observer, so one table serves
+    every location. It is stored as a single float64 .npy file: row 0 holds
+    (start epoch seconds, step seconds), the remaining rows hold
+    (declination, equation of time). The file is memory-mapped read-only, so
+    every worker process on a machine shares the same pages.
+
+    Linear interpolation at a 30 minute step is accurate to better than 1e-6 degrees.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        data = np.load(path, mmap_mode="r")
+        self.start = float(data[0, 0])
+        self.step = float(data[0, 1])
+        self.values = data[1:]
+        self.end = self.start + self.step * (len(self.values) - 1)
+
+    @staticmethod
+    def build(path, start_year, end_year, step_minutes):
+        """
+        Compute the table for [start_year, end_year) and write it to path.
+
+        Written to a temporary file first, so concurrent readers never see a partial table.
+        """
+        start = datetime(start_year, 1, 1, tzinfo=_UTC).timestamp()
+        end = datetime(end_year, 1, 1, tzinfo=_UTC).timestamp()
+        step = step_minutes * 60.0
+        epochs = np.arange(start, end + step, step)
+        declination, eqtime = declination_and_equation_of_time(julian_century(epochs))
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(len(epochs) + 1, 2))
+        table[0] = (start, step)
+        table[1:, 0] = declination
+        table[1:, 1] = eqtime
+        table.flush()
+        del table
+        os.replace(tmp_path, path)
+
+    def covers(self, epoch_seconds) -> bool:
+        return bool(np.all((epoch_seconds >= self.start) & (epoch_seconds <= self.end)))
+
+    def lookup(self, epoch_seconds) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Interpolated (declination, equation of time) for epoch seconds within the table.
+        """
+        position = (np.asarray(epoch_seconds, dtype=np.float64) - self.start) / self.step
+        index = np.clip(np.floor(position).astype(np.int64), 0, len(self.values) - 2)
+        fraction = position - index
+        lower = self.values[index]
+        upper = self.values[index + 1]
+        interpolated = lower + (upper - lower) * fraction[..., None]
+        return interpolated[..., 0], interpolated[..., 1]
+
+
+_ephemeris_table = None
+_ephemeris_table_lock = threading.Lock()
+
+
+def get_ephemeris_table():
+    """
+    The shared ephemeris table, building the file the first time if needed.
+
+    Returns None if the table is disabled (EPHEMERIS_TABLE_PATH is None) or can't be built.
+    """
+    global _ephemeris_table
+    if _ephemeris_table is None and EPHEMERIS_TABLE_PATH:
+        with _ephemeris_table_lock:
+            if _ephemeris_table is None:
+                try:
+                    if not os.path.exists(EPHEMERIS_TABLE_PATH):
+                        EphemerisTable.build(
+                            EPHEMERIS_TABLE_PATH,
+                            EPHEMERIS_TABLE_START_YEAR,
+                            EPHEMERIS_TABLE_END_YEAR,
+                            EPHEMERIS_TABLE_STEP_MINUTES,
+                        )
+                    _ephemeris_table = EphemerisTable(EPHEMERIS_TABLE_PATH)
+                except OSError as e:
+                    print(f"Could not load ephemeris table, computing directly: {e}")
+                    return None
+    return _ephemeris_table
+
+
+def ephemeris_at(epoch_seconds) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Declination and equation of time for epoch seconds.
+
+    Interpolated from the shared ephemeris table when the instants are within it,
+    computed directly otherwise.
+    """
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+    table = get_ephemeris_table()
+    if table is not None and table.covers(epoch_seconds):
+        return table.lookup(epoch_seconds)
+    return declination_and_equation_of_time(julian_century(epoch_seconds))
+
+
+def refraction_correction(elevation) -> np.ndarray:
+    """
+    Degrees of atmospheric refraction for the given (geometric) elevations.
+
+    Vectorized version of astral.refraction_at_zenith.
+    """
+    elevation = np.asarray(elevation, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        te = np.tan(np.radians(elevation))
+        high = 58.1 / te - 0.07 / te**3 + 0.000086 / te**5
+        near = 1735.0 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+        low = -20.774 / te
+
+    correction = np.where(elevation > 5.0, high, np.where(elevation > -0.575, near, low))
+    correction = np.where(elevation >= 85.0, 0.0, correction)
+    return correction / 3600.0
+
+
+def solar_position_from_ephemeris(lat, lon, epoch_seconds, declination, eqtime, with_refraction=True):
+    """
+    Elevation and azimuth given precomputed declination and equation of time.
+
+    Split out from sun_position so callers that already have the
+    observer-independent quantities for a set of instants can skip them.
+    """
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -89.8, 89.8)
+    lon = np.asarray(lon, dtype=np.float64)
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+
+    utc_minutes = np.mod(epoch_seconds, SECONDS_PER_DAY) / 60.0
+    true_solar_time = utc_minutes + eqtime + 4.0 * lon
+    hourangle = np.mod(true_solar_time / 4.0, 360.0) - 180.0
+
+    cl = np.cos(np.radians(lat))
+    sl = np.sin(np.radians(lat))
+    sd = np.sin(np.radians(declination))
+    cd = np.cos(np.radians(declination))
+
+    csz = np.clip(cl * cd * np.cos(np.radians(hourangle)) + sl * sd, -1.0, 1.0)
+    zenith = np.degrees(np.arccos(csz))
+
+    az_denom = cl * np.sin(np.radians(zenith))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        az_rad = np.clip((sl * np.cos(np.radians(zenith)) - sd) / az_denom, -1.0, 1.0)
+    azimuth = 180.0 - np.degrees(np.arccos(az_rad))
+    azimuth = np.where(hourangle > 0.0, -azimuth, azimuth)
+    azimuth = np.where(np.abs(az_denom) > 0.001, azimuth, np.where(lat > 0.0, 180.0, 0.0))
+    azimuth = np.mod(azimuth, 360.0)
+
+    elevation = 90.0 - zenith
+    if with_refraction:
+        elevation = elevation + refraction_correction(elevation)
+
+    return elevation, azimuth
+
+
+def sun_position(lat, lon, epoch_seconds, with_refraction=True) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate the sun's elevation and azimuth for arrays of timestamps.
+
+    Args:
+        lat: Latitude(s) in degrees
+        lon: Longitude(s) in degrees
+        epoch_seconds: Timestamps as POSIX epoch seconds (UTC)
+        with_refraction: Adjust elevation for atmospheric refraction (as astral does)
+
+    Returns:
+        tuple (elevation, azimuth): arrays in degrees, broadcast over the inputs
+    """
+    declination, eqtime = ephemeris_at(epoch_seconds)
+    return solar_position_from_ephemeris(lat, lon, epoch_seconds, declination, eqtime, with_refraction)
+
+
+def _transit_time_utc(lat, lon, day_epochs, zenith, setting):
+    """
+    Vectorized astral.sun.time_of_transit.
+
+    Returns epoch seconds of the transit on each UTC day in `day_epochs`
+    (midnight UTC), or NaN where the sun never reaches the zenith. `setting`
+    may be an array (e.g. [[False], [True]]) broadcast against day_epochs to
+    get sunrises and sunsets at once; the first iteration's ephemeris, at
+    midnight UTC, is then shared by both.
+    """
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -89.8, 89.8)
+    lon = np.asarray(lon, dtype=np.float64)
+    day_epochs = np.asarray(day_epochs, dtype=np.float64)
+
+    zenith_rad = math.radians(zenith + refraction_at_zenith(zenith))
+    declination, eqtime = ephemeris_at(day_epochs)
+    time_utc = np.zeros_like(day_epochs)
+
+    for iteration in range(2):
+        if iteration:
+            declination, eqtime = ephemeris_at(day_epochs + time_utc / 1440.0 * SECONDS_PER_DAY)
+        decl_rad = np.radians(declination)
+        lat_rad = np.radians(lat)
+        h = (math.cos(zenith_rad) - np.sin(lat_rad) * np.sin(decl_rad)) / (np.cos(lat_rad) * np.cos(decl_rad))
+        with np.errstate(invalid="ignore"):
+            hourangle = np.arccos(np.where(np.abs(h) <= 1.0, h, np.nan))
+        hourangle = np.where(setting, -hourangle, hourangle)
+
+        offset = (-lon - np.degrees(hourangle)) * 4.0 - eqtime
+        offset = np.where(offset < -720.0, offset + 1440.0, offset)
+        time_utc = 720.0 + offset
+
+    return day_epochs + time_utc * 60.0
+
+
+def _utc_midnight_epochs(dates) -> np.ndarray:
+    return np.array(
+        [datetime(d.year, d.month, d.day, tzinfo=_UTC).timestamp() for d in dates],
+        dtype=np.float64,
+    )
+
+
+def _local_dates(epochs, tz: ZoneInfo) -> list:
+    return [
+        None if np.isnan(e) else datetime.fromtimestamp(e, tz).date()
+        for e in epochs
+    ]
+
+
+def _settings(time_of_day: str) -> np.ndarray:
+    """
+    Whether each row is a sunset, as a column to broadcast against per-day arrays ("both" is sunrise, sunset).
+    """
+    if time_of_day == "both":
+        return np.array([[False], [True]])
+    return np.array([[time_of_day != "sunrise"]])
+
+
+def horizon_times(lat, lon, dates, tz: ZoneInfo, time_of_day: str = "sunset") -> np.ndarray:
+    """
+    Sunrise or sunset times for a list of local dates at one location.
+
+    Mirrors astral.sun.sunrise/sunset, including its retry on the adjacent
+    UTC day when the transit falls on a different local date.
+
+    With time_of_day="both", sunrises and sunsets are calculated together
+    (sharing their per-day quantities) as an array of shape (2, len(dates)).
+
+    Returns:
+        Epoch seconds, NaN where there is no sunrise/sunset on that date.
+    """
+    setting = _settings(time_of_day)
+    dates = list(dates)
+    times = _transit_time_utc(lat, lon, _utc_midnight_epochs(dates), SUNRISE_SUNSET_ZENITH, setting)
+
+    for row, row_setting in zip(times, setting[:, 0]):
+        local = _local_dates(row, tz)
+        retry = [i for i, d in enumerate(dates) if local[i] is not None and local[i] != d]
+        if retry:
+            shifted = [
+                dates[i] + timedelta(days=1 if local[i] < dates[i] else -1) for i in retry
+            ]
+            retried = _transit_time_utc(lat, lon, _utc_midnight_epochs(shifted), SUNRISE_SUNSET_ZENITH, row_setting)
+            for i, t in zip(retry, retried):
+                ok = not np.isnan(t) and datetime.fromtimestamp(t, tz).date() == dates[i]
+                row[i] = t if ok else np.nan
+
+    return times if time_of_day == "both" else times[0]
+
+
+def horizon_azimuths(
+    lat: float,
+    lon: float,
+    dates,
+    tz: ZoneInfo,
+    target_altitude_deg: float,
+    search_window_minutes: int,
+    time_of_day: str = "sunset",
+    solver: str = "binary",
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batch version of utils.get_horizon_azimuth for many local dates.
+
+    With the "binary" solver, instead of binary searching minute by minute,
+    every minute of the search window is evaluated for every date in one
+    NumPy pass, and the same boundary minute the binary search would land
+    on is picked per day: the last minute above the target altitude before
+    sunset, or the first one after sunrise.
+
+    With the "secant" solver the exact crossing of the target altitude is
+    found for all dates at once (see find_altitude_crossing).
+
+    Args:
+        lat: Latitude in degrees
+        lon: Longitude in degrees
+        dates: Iterable of local dates
+        tz: Timezone for the location
+        target_altitude_deg: Target altitude in degrees
+        search_window_minutes: Search window in minutes
+        time_of_day: "sunrise", "sunset" or "both"
+        solver: "binary" (whole-minute boundary) or "secant" (sub-second crossing)
+
+    Returns:
+        tuple (azimuths, epoch_seconds): NaN for dates without a sunrise/sunset. With
+        time_of_day="both", arrays of shape (2, len(dates)): sunrises, then sunsets,
+        calculated in the same passes.
+    """
+    setting = _settings(time_of_day)
+    reference = horizon_times(lat, lon, dates, tz, time_of_day).reshape(len(setting), -1)
+
+    if solver == "secant":
+        exact_times = find_altitude_crossing(
+            lambda t: sun_position(lat, lon, t)[0],
+            reference,
+            target_altitude_deg,
+            search_window_minutes,
+            np.where(setting, "sunset", "sunrise"),
+        )
+        _, azimuths = sun_position(lat, lon, exact_times)
+        if time_of_day != "both":
+            return azimuths[0], exact_times[0]
+        return azimuths, exact_times
+
+    # astral evaluates positions at whole-second resolution; keep to it so results match.
+    whole_seconds = np.floor(reference)
+
+    # Sunrise rows probe from a minute before to the end of the window, sunset rows from the
+    # start of the window to a minute after (the same number of minutes)
+    start = np.where(setting, -search_window_minutes, -1)
+    end = np.where(setting, 1, search_window_minutes)
+    offsets = start + np.arange(search_window_minutes + 2)
+
+    probe_times = whole_seconds[:, :, None] + offsets[:, None, :] * 60.0
+    elevation, _ = sun_position(lat, lon, probe_times)
+    above = np.count_nonzero(elevation > target_altitude_deg, axis=2)
+
+    boundary = np.where(
+        setting,
+        start + np.maximum(above - 1, 0),  # sunset: last minute above the target (or the start of the window if none)
+        np.minimum(end, end - above + 1),  # sunrise: first minute above the target (or the end of the window if none)
+    )
+
+    _, azimuths = sun_position(lat, lon, whole_seconds + boundary * 60.0)
+    times = reference + boundary * 60.0
+    if time_of_day != "both":
+        return azimuths[0], times[0]
+    return azimuths, times
+
+
+def find_altitude_crossing(
+    elevation_fn,
+    seed_epochs,
+    target_altitude_deg: float,
+    search_window_minutes: int,
+    time_of_day: str = "sunset",
+    tolerance_seconds: float = 0.1,
+    max_iterations: int = 10,
+    tolerance_deg: float = 0.01,
+) -> np.ndarray:
+    """
+    Find when the sun crosses the target altitude, using the secant method.
+
+    Near the horizon the sun's elevation is very close to linear in time, so
+    seeding at sunrise/sunset and a few minutes towards the target converges
+    to sub-second precision in 3-4 elevation evaluations, versus ~5 for a
+    whole-minute binary search.
+
+    Args:
+        elevation_fn: Maps an array of epoch seconds to an array of elevations
+        seed_epochs: Sunrise/sunset times (epoch seconds) to start from
+        target_altitude_deg: Target altitude in degrees
+        search_window_minutes: The crossing must be within this many minutes of the seed
+        time_of_day: "sunrise" or "sunset" (or an array of them, broadcast against seed_epochs)
+        tolerance_seconds: Stop once the secant step is smaller than this
+        max_iterations: Give up (NaN) if not converged after this many steps
+        tolerance_deg: How far (in degrees) from the target altitude a converged point may be
+
+    Returns:
+        Epoch seconds of the crossing, NaN where there is none in the window
+    """
+    seed_epochs = np.asarray(seed_epochs, dtype=np.float64)
+    window = search_window_minutes * 60.0
+    # The sun is above the target before sunset and after sunrise.
+    direction = np.where(np.asarray(time_of_day) == "sunrise", 1.0, -1.0)
+    lower = seed_epochs - np.where(direction < 0, window, 60.0)
+    upper = seed_epochs + np.where(direction > 0, window, 60.0)
+
+    t0 = seed_epochs
+    f0 = elevation_fn(t0) - target_altitude_deg
+    t1 = seed_epochs + direction * min(window, 300.0)
+    f1 = elevation_fn(t1) - target_altitude_deg
+
+    converged = np.zeros(seed_epochs.shape, dtype=bool)
+    for _ in range(max_iterations):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(f1 != f0, -f1 * (t1 - t0) / (f1 - f0), 0.0)
+        t0, f0 = t1, f1
+        t1 = np.clip(t1 + step, lower, upper)
+        converged = np.abs(step) < tolerance_seconds
+        if np.all(converged | np.isnan(t1)):
+            break
+        f1 = elevation_fn(t1) - target_altitude_deg
+
+    # A crossing outside the window pins t1 at its edge, where the step is 0 without being a crossing
+    found = converged & (np.abs(f1) < tolerance_deg) & (t1 > lower) & (t1 < upper)
+    return np.where(found, t1, np.nan)
+
+
+def to_local_date(d, tz: ZoneInfo) -> date:
+    """
+    Local calendar date for a date/datetime, as get_horizon_azimuth interprets it.
+    """
+    if isinstance(d, datetime):
+        return d.astimezone(tz).date() if d.tzinfo is not None else d.date()
+    return d
@@ -671,6 +671,8 @@ let streetCanvas, streetCtx, streetNonHengeCanvas, streetNonHengeCtx;
 let currentTimeMinutes = 255; // Start at 8:15 PM (4PM + 255 minutes) for henge view
 let currentNonHengeTimeMinutes = 180; // Start at 7:00 PM for non-henge view
 const MANHATTAN_BEARING = 299; // Manhattan street bearing
+const STREET_CURVE_MINUTES = 300; // Minutes after 4 PM covered by the sun curves (both sliders end before this)
+const sunCurves = {}; // Sun curve requests, by start time
 let streetAnimationInitialized = false;
 
 function initStreetVisualization() {
@@ -761,20 +763,10 @@ function updateStreetScene() {
     const startHour = 16; // 4 PM
     const hours = Math.floor(currentTimeMinutes / 60);
     const minutes = currentTimeMinutes % 60;
-    const targetTime = new Date(2026, 5, 28, startHour + hours, minutes); // December 27, 2026
-
-    // Call API to get sun position
-    fetch('/lookup_azimuth_altitude', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            time: targetTime.toISOString(),
-            road_bearing: MANHATTAN_BEARING
-        })
-    })
-        .then(response => response.json())
+    const dayStart = new Date(2026, 5, 28, startHour); // December 27, 2026
+
+    // Interpolate the sun position from the day's curve (fetched once)
+    getStreetSunPosition(dayStart, hours * 60 + minutes)
         .then(data => {
             drawStreetScene(streetCtx, streetCanvas, data.graphic_az, data.altitude, 'hengeIndicator');
         })
@@ -785,6 +777,36 @@ function updateStreetScene() {
         });
 }
 
+// Sun position (graphic_az, altitude) minutesAfterStart minutes after dayStart, interpolated
+// from a per-minute curve so moving a slider doesn't need a request per frame
+function getStreetSunPosition(dayStart, minutesAfterStart) {
+    const key = dayStart.toISOString();
+    if (!sunCurves[key]) {
+        const canonicalStart = dayStart.toISOString().replace(/\.\d{3}Z$/, 'Z');
+        const url = '/lookup_sun_curve?' + new URLSearchParams({ start: canonicalStart, minutes: STREET_CURVE_MINUTES });
+        sunCurves[key] = fetch(url)
+            .then(response => {
+                if (!response.ok) throw new Error(`Sun curve request failed: ${response.status}`);
+                return response.json();
+            })
+            .catch(error => {
+                delete sunCurves[key]; // retry on the next slider move
+                throw error;
+            });
+    }
+    return sunCurves[key].then(curve => interpolateSunCurve(curve, minutesAfterStart));
+}
+
+function interpolateSunCurve(curve, minutesAfterStart) {
+    const position = Math.min(Math.max(minutesAfterStart / curve.step_minutes, 0), curve.altitude.length - 1);
+    const i = Math.min(Math.floor(position), curve.altitude.length - 2);
+    const fraction = position - i;
+    return {
+        graphic_az: curve.graphic_az[i] + (curve.graphic_az[i + 1] - curve.graphic_az[i]) * fraction,
+        altitude: curve.altitude[i] + (curve.altitude[i + 1] - curve.altitude[i]) * fraction
+    };
+}
+
 function updateNonHengeScene() {
     if (!streetNonHengeCtx || !streetNonHengeCanvas) return;
 
@@ -792,20 +814,10 @@ function updateNonHengeScene() {
     const startHour = 16; // 4 PM
     const hours = Math.floor(currentNonHengeTimeMinutes / 60);
     const minutes = currentNonHengeTimeMinutes % 60;
-    const targetTime = new Date(2025, 8, 10, startHour + hours, minutes); // September 10, 2025
-
-    // Call API to get sun position
-    fetch('/lookup_azimuth_altitude', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            time: targetTime.toISOString(),
-            road_bearing: MANHATTAN_BEARING
-        })
-    })
-        .then(response => response.json())
+    const dayStart = new Date(2025, 8, 10, startHour); // September 10, 2025
+
+    // Interpolate the sun position from the day's curve (fetched once)
+    getStreetSunPosition(dayStart, hours * 60 + minutes)
         .then(data => {
             drawStreetScene(streetNonHengeCtx, streetNonHengeCanvas, data.graphic_az, data.altitude, 'nonHengeIndicator');
         })
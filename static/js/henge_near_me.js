@@ -573,6 +573,29 @@ function initializeTimeToggle() {
     });
 }
 
+// Decode a base64 string into a typed array of the given type (columns are little-endian)
+function decodeColumn(base64, ArrayType) {
+    const bytes = Uint8Array.from(atob(base64), c => c.charCodeAt(0));
+    return new ArrayType(bytes.buffer);
+}
+
+// Turn the binary columnar sun angles from /lookup_sun_angles into
+// a sparse array of {date, azimuth} indexed by day
+function decodeSunAngles(packed) {
+    const days = decodeColumn(packed.days, Uint16Array);
+    const offsets = decodeColumn(packed.offsets, Int32Array);
+    const azimuths = decodeColumn(packed.azimuths, Float32Array);
+    
+    const sunAngles = [];
+    for (let i = 0; i < packed.count; i++) {
+        sunAngles[days[i]] = {
+            date: new Date((packed.start_epoch + offsets[i]) * 1000),
+            azimuth: azimuths[i]
+        };
+    }
+    return sunAngles;
+}
+
 // Load city data and calculate sun angles
 async function loadCityData(cityName, isToggleChange = false) {
     const mapAndControls = document.getElementById('mapAndControls');
@@ -590,7 +613,8 @@ async function loadCityData(cityName, isToggleChange = false) {
             body: JSON.stringify({
                 address: cityName,
                 start_date: today.toISOString().split('T')[0], // YYYY-MM-DD format
-                time_of_day: currentTimeOfDay
+                time_of_day: currentTimeOfDay,
+                format: 'binary'
             })
         });
         
@@ -598,7 +622,7 @@ async function loadCityData(cityName, isToggleChange = false) {
         
         if (response.ok) {
             currentCityData = data;
-            sunAnglesData = data.sun_angles;
+            sunAnglesData = decodeSunAngles(data.sun_angles);
             
             // Set the date range for the slider
             startDate = new Date(data.start_date);
@@ -629,14 +653,21 @@ async function loadCityData(cityName, isToggleChange = false) {
             // Update azimuth display
             updateAzimuthDisplay();
             
-            // Fetch street data from Overpass API and then initialize road filtering
+            // Initialize road filtering from the server-side street index,
+            // falling back to fetching street data from the Overpass API
             try {
-                console.log('Fetching street data from Overpass API...');
-                const rawOverpassData = await fetchStreetDataFromOverpass(data.coordinates);
+                const azimuth = sunAnglesData[currentDayOfYear] ? sunAnglesData[currentDayOfYear].azimuth : 0;
+                const usingServerIndex = typeof RoadFilter !== 'undefined' &&
+                    await RoadFilter.initializeWithServerIndex(data.coordinates, azimuth);
                 
-                // Initialize road filtering with the raw Overpass data for processing
-                if (typeof RoadFilter !== 'undefined') {
-                    RoadFilter.initializeWithOverpassData(data.coordinates, sunAnglesData, rawOverpassData);
+                if (!usingServerIndex) {
+                    console.log('Fetching street data from Overpass API...');
+                    const rawOverpassData = await fetchStreetDataFromOverpass(data.coordinates);
+                    
+                    // Initialize road filtering with the raw Overpass data for processing
+                    if (typeof RoadFilter !== 'undefined') {
+                        RoadFilter.initializeWithOverpassData(data.coordinates, sunAnglesData, rawOverpassData);
+                    }
                 }
                 
                 // Hide loading indicator after Overpass API completes successfully
@@ -10,6 +10,10 @@ const RoadFilter = {
     currentBounds: null,
     azimuthRange: { min: 0, max: 360 },
     isEnabled: true,
+    useServerIndex: false,
+    cityCenter: null,
+    totalStreets: 0,
+    requestSeq: 0,
     
     // Configuration
     config: {
@@ -33,6 +37,70 @@ const RoadFilter = {
         this.updateStats();
     },
     
+    // Initialize road filtering with the server-side street index (/aligned_streets).
+    // Resolves to false if the server can't provide one, so the caller can fall back to Overpass.
+    initializeWithServerIndex: async function(coordinates, azimuth) {
+        console.log('Initializing road filter with server street index:', coordinates);
+        this.currentBounds = this.calculateBounds(coordinates.lat, coordinates.lon, 25); // 25km radius
+        this.cityCenter = coordinates;
+        this.azimuthRange = {
+            min: azimuth - this.config.alignmentTolerance,
+            max: azimuth + this.config.alignmentTolerance
+        };
+        
+        try {
+            await this.fetchAlignedStreets();
+        } catch (e) {
+            console.warn('Server street index unavailable, falling back to Overpass:', e);
+            this.cityCenter = null;
+            return false;
+        }
+        
+        this.useServerIndex = true;
+        this.streetData = [];
+        this.hideLoadingState();
+        this.createStreetHighlights();
+        this.updateStats();
+        return true;
+    },
+    
+    // Query the server-side index for streets aligned with the current azimuth in the current view
+    fetchAlignedStreets: async function() {
+        const seq = ++this.requestSeq;
+        const params = new URLSearchParams({
+            lat: this.cityCenter.lat,
+            lon: this.cityCenter.lon,
+            azimuth: (this.azimuthRange.min + this.azimuthRange.max) / 2,
+            tolerance: this.config.alignmentTolerance,
+            min_length: this.config.minStreetLength,
+            max_length: this.config.maxStreetLength,
+            types: this.getSelectedRoadTypes().join(',')
+        });
+        if (map) {
+            const bounds = map.getBounds();
+            params.set('south', bounds.getSouth());
+            params.set('west', bounds.getWest());
+            params.set('north', bounds.getNorth());
+            params.set('east', bounds.getEast());
+        }
+        
+        const response = await fetch(`/aligned_streets?${params}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        
+        // A newer query was sent while this one was in flight
+        if (seq !== this.requestSeq) return false;
+        
+        if (data.truncated) {
+            console.log(`Limiting to ${data.streets.length} streets for performance`);
+        }
+        this.totalStreets = data.total_streets;
+        this.filteredStreets = data.streets;
+        return true;
+    },
+    
     // Calculate bounding box for a city
     calculateBounds: function(lat, lon, radiusKm) {
         const latDelta = radiusKm / 111.0;
@@ -198,6 +266,17 @@ const RoadFilter = {
             azimuthRange: this.azimuthRange
         });
         
+        if (this.useServerIndex) {
+            this.fetchAlignedStreets().then(updated => {
+                if (!updated) return;
+                this.clearStreetHighlights();
+                console.log(`Received ${this.filteredStreets.length} aligned streets from server`);
+                this.createStreetHighlights();
+                this.updateStats();
+            }).catch(e => this.showError(`Error fetching aligned streets: ${e.message}`));
+            return;
+        }
+        
         // Clear existing highlights
         this.clearStreetHighlights();
         
@@ -404,7 +483,7 @@ const RoadFilter = {
         const alignedElement = document.getElementById('alignedStreets');
         
         if (totalElement) {
-            const total = this.streetData ? this.streetData.length : 0;
+            const total = this.useServerIndex ? this.totalStreets : (this.streetData ? this.streetData.length : 0);
             totalElement.textContent = total.toLocaleString();
             
             // Add animation for value updates
@@ -506,6 +585,10 @@ const RoadFilter = {
         this.streetData = null;
         this.filteredStreets = [];
         this.currentBounds = null;
+        this.useServerIndex = false;
+        this.cityCenter = null;
+        this.totalStreets = 0;
+        this.requestSeq++;
     }
 };
 
@@ -0,0 +1,292 @@
+"""
+Server-side index of street bearings for a city, answering "which streets
+line up with the sun at azimuth X inside this bounding box?".
+
+Streets (named OSM highways, the same selection the map page used to
+download from Overpass in the browser) are indexed once per city:
+
+    - every street gets a bearing from its first to its last point
+      (utils.calculate_bearing, the same math as get_road_bearing), folded
+      into [0, 180) because a street lines up with the sun in either direction
+    - a spatial grid of STREET_INDEX_CELL_DEG cells lists the streets whose
+      bounding box overlaps each cell, sorted by folded bearing
+
+A query visits the grid cells overlapping the requested bounding box and
+binary searches each cell's bearing-sorted list for the azimuth ± tolerance,
+so only candidate streets are ever looked at.
+
+Indexes are kept in an LRU and saved to STREET_INDEX_DIR, so each city is
+only downloaded once. A download only holds up requests for the same city.
+"""
+import math
+import os
+
+import numpy as np
+
+from cache import LRUCache, SingleFlight
+from config import STREET_INDEX_DIR, STREET_INDEX_CELL_DEG, STREET_INDEX_RADIUS_M, STREET_INDEX_CITY_PRECISION, STREET_INDEX_CACHE_SIZE
+from utils import calculate_bearing
+
+STREET_TYPES = ['primary', 'secondary', 'tertiary', 'residential', 'trunk', 'motorway', 'unclassified', 'service']
+EARTH_RADIUS_M = 6371000
+
+
+def download_ways(lat, lon, radius_m=STREET_INDEX_RADIUS_M):
+    """
+    Download the named streets around a point from OSM.
+
+    Returns:
+        list of dicts with id, name, type and geometry (list of (lat, lon))
+    """
+    import osmnx as ox
+
+    features = ox.features_from_point((lat, lon), tags={'highway': STREET_TYPES}, dist=radius_m)
+    ways = []
+    for (element, osm_id), row in features.iterrows():
+        name = row.get('name')
+        if element != 'way' or not isinstance(name, str) or row.geometry.geom_type != 'LineString':
+            continue
+        ways.append({
+            'id': int(osm_id),
+            'name': name,
+            'type': row.get('highway'),
+            'geometry': [(y, x) for x, y in row.geometry.coords],
+        })
+    return ways
+
+
+def ways_from_overpass(data):
+    """
+    Convert raw Overpass JSON ("out geom") into the way dicts StreetIndex.build expects.
+    """
+    return [
+        {
+            'id': element['id'],
+            'name': element.get('tags', {}).get('name', 'Unnamed Street'),
+            'type': element.get('tags', {}).get('highway', 'unknown'),
+            'geometry': [(point['lat'], point['lon']) for point in element.get('geometry', [])],
+        }
+        for element in data.get('elements', [])
+        if len(element.get('geometry', [])) >= 2
+    ]
+
+
+def _haversine_lengths(coords, offsets):
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    step = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+    # Drop the steps that join the last point of one street to the first of the next
+    step[offsets[1:-1] - 1] = 0.0
+    cumulative = np.concatenate([[0.0], np.cumsum(step)])
+    return cumulative[offsets[1:] - 1] - cumulative[offsets[:-1]]
+
+
+class StreetIndex:
+    """
+    Bearing-sorted, grid-bucketed index of a city's streets.
+
+    Streets are stored column-wise: ids, names, type codes, bearings (0-360,
+    first to last point), lengths (m), bounding boxes, and their geometries
+    as one flat coordinate array with per-street offsets.
+    """
+
+    ARRAYS = ['ids', 'type_codes', 'bearings', 'lengths', 'bboxes', 'coords', 'offsets', 'origin', 'cell_deg', 'cell_shape', 'cell_start', 'cell_streets', 'cell_bearings']
+
+    def __init__(self, **arrays):
+        self.names = [str(name) for name in arrays.pop('names')]
+        self.types = [str(t) for t in arrays.pop('types')]
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, ways, cell_deg=STREET_INDEX_CELL_DEG):
+        """
+        Build the index from way dicts (id, name, type, geometry).
+        """
+        ways = [w for w in ways if len(w['geometry']) >= 2]
+        types = sorted({str(w['type']) for w in ways})
+        coords = np.array([p for w in ways for p in w['geometry']], dtype=np.float64).reshape(-1, 2)
+        offsets = np.concatenate([[0], np.cumsum([len(w['geometry']) for w in ways])]).astype(np.int64)
+
+        first, last = coords[offsets[:-1]], coords[offsets[1:] - 1]
+        bearings = calculate_bearing(first[:, 0], first[:, 1], last[:, 0], last[:, 1])
+        lengths = _haversine_lengths(coords, offsets) if ways else np.zeros(0)
+
+        starts = offsets[:-1]
+        bboxes = np.stack([
+            np.minimum.reduceat(coords[:, 0], starts), np.minimum.reduceat(coords[:, 1], starts),
+            np.maximum.reduceat(coords[:, 0], starts), np.maximum.reduceat(coords[:, 1], starts),
+        ], axis=1) if ways else np.zeros((0, 4))
+
+        # Spatial grid over the city, each cell listing the overlapping streets sorted by folded bearing
+        origin = bboxes[:, :2].min(axis=0) if ways else np.zeros(2)
+        extent = bboxes[:, 2:].max(axis=0) - origin if ways else np.zeros(2)
+        shape = np.floor(extent / cell_deg).astype(int) + 1
+        lo = np.floor((bboxes[:, :2] - origin) / cell_deg).astype(int)
+        hi = np.floor((bboxes[:, 2:] - origin) / cell_deg).astype(int)
+
+        folded = np.mod(bearings, 180.0)
+        buckets = [[] for _ in range(shape[0] * shape[1])]
+        for i in np.argsort(folded, kind='stable'):
+            for row in range(lo[i, 0], hi[i, 0] + 1):
+                for col in range(lo[i, 1], hi[i, 1] + 1):
+                    buckets[row * shape[1] + col].append(i)
+        cell_start = np.concatenate([[0], np.cumsum([len(b) for b in buckets])]).astype(np.int64)
+        cell_streets = np.array([i for b in buckets for i in b], dtype=np.int32)
+
+        return cls(
+            ids=np.array([w['id'] for w in ways], dtype=np.int64),
+            names=np.array([w['name'] for w in ways], dtype=object),
+            types=np.array(types, dtype=object),
+            type_codes=np.array([types.index(str(w['type'])) for w in ways], dtype=np.int16),
+            bearings=bearings.astype(np.float32),
+            lengths=lengths.astype(np.float32),
+            bboxes=bboxes,
+            coords=coords,
+            offsets=offsets,
+            origin=origin,
+            cell_deg=np.float64(cell_deg),
+            cell_shape=shape,
+            cell_start=cell_start,
+            cell_streets=cell_streets,
+            cell_bearings=folded[cell_streets].astype(np.float64),
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            names=np.array(self.names, dtype=str),
+            types=np.array(self.types, dtype=str),
+            **{name: getattr(self, name) for name in self.ARRAYS},
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, azimuth, tolerance, bbox=None, min_length=0, max_length=math.inf, types=None, limit=None):
+        """
+        Streets within ±tolerance degrees of the azimuth (in either direction).
+
+        Args:
+            azimuth: Sun azimuth in degrees
+            tolerance: Alignment tolerance in degrees
+            bbox: Optional (south, west, north, east); streets with any point inside are returned
+            min_length, max_length: Street length range in meters
+            types: Optional list of highway types to include
+            limit: Optional maximum number of streets (closest alignments first)
+
+        Returns:
+            tuple (indexes, alignment_offsets): street indexes sorted by how closely they align
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        folded = azimuth % 180.0
+        ranges = [(folded - tolerance, folded + tolerance)]
+        if folded - tolerance < 0:
+            ranges.append((folded - tolerance + 180.0, 180.0))
+        if folded + tolerance >= 180.0:
+            ranges.append((0.0, folded + tolerance - 180.0))
+
+        # Grid cells overlapping the bounding box
+        n_rows, n_cols = self.cell_shape
+        if bbox is None:
+            rows, cols = range(n_rows), range(n_cols)
+        else:
+            south, west, north, east = bbox
+            cell_deg = float(self.cell_deg)
+            rows = range(max(int((south - self.origin[0]) // cell_deg), 0), min(int((north - self.origin[0]) // cell_deg), n_rows - 1) + 1)
+            cols = range(max(int((west - self.origin[1]) // cell_deg), 0), min(int((east - self.origin[1]) // cell_deg), n_cols - 1) + 1)
+
+        candidates = []
+        for row in rows:
+            for col in cols:
+                start, end = self.cell_start[row * n_cols + col], self.cell_start[row * n_cols + col + 1]
+                cell_bearings = self.cell_bearings[start:end]
+                for lo, hi in ranges:
+                    i = start + np.searchsorted(cell_bearings, lo, side='left')
+                    j = start + np.searchsorted(cell_bearings, hi, side='right')
+                    candidates.append(self.cell_streets[i:j])
+        if not candidates:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        candidates = np.unique(np.concatenate(candidates))
+
+        keep = (self.lengths[candidates] >= min_length) & (self.lengths[candidates] <= max_length)
+        if types is not None:
+            codes = [self.types.index(t) for t in types if t in self.types]
+            keep &= np.isin(self.type_codes[candidates], codes)
+        candidates = candidates[keep]
+
+        if bbox is not None:
+            candidates = np.array([i for i in candidates if self._has_point_in(i, bbox)], dtype=np.int64)
+
+        offsets = np.abs((self.bearings[candidates] - azimuth + 90.0) % 180.0 - 90.0)
+        order = np.argsort(offsets, kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return candidates[order], offsets[order]
+
+    def _has_point_in(self, i, bbox):
+        south, west, north, east = bbox
+        points = self.coords[self.offsets[i]:self.offsets[i + 1]]
+        return bool(np.any((points[:, 0] >= south) & (points[:, 0] <= north) & (points[:, 1] >= west) & (points[:, 1] <= east)))
+
+    def street(self, i):
+        """
+        A street as the map page expects it (same fields road_filter.js used to build).
+        """
+        points = self.coords[self.offsets[i]:self.offsets[i + 1]]
+        return {
+            'id': f"way_{self.ids[i]}",
+            'name': self.names[i],
+            'type': self.types[self.type_codes[i]],
+            'geometry': [{'lat': float(lat), 'lon': float(lon)} for lat, lon in points],
+            'bearing': round(float(self.bearings[i]), 1),
+            'length': round(float(self.lengths[i]), 1),
+            'osm_id': int(self.ids[i]),
+        }
+
+
+_street_indexes = LRUCache("street_indexes", max_entries=STREET_INDEX_CACHE_SIZE)
+
+# Concurrent requests for the same city wait for one build; other cities carry on
+street_index_flight = SingleFlight("street_index")
+
+
+def get_street_index(lat, lon, radius_m=STREET_INDEX_RADIUS_M):
+    """
+    The street index for the city around (lat, lon), built (and saved) on first use.
+
+    Cities are keyed on coordinates rounded to STREET_INDEX_CITY_PRECISION decimals
+    (~11 km), so nearby lookups share one index centered on the rounded point.
+    """
+    key = (round(lat, STREET_INDEX_CITY_PRECISION), round(lon, STREET_INDEX_CITY_PRECISION), radius_m)
+    index = _street_indexes.get(key)
+    if index is not None:
+        return index
+    return street_index_flight.do(key, _get_street_index, key)
+
+
+def _get_street_index(key):
+    index = _street_indexes.get(key)
+    if index is not None:
+        return index
+
+    lat, lon, radius_m = key
+    path = os.path.join(STREET_INDEX_DIR, f"{lat}_{lon}_{radius_m}.npz") if STREET_INDEX_DIR else None
+    if path and os.path.exists(path):
+        index = StreetIndex.load(path)
+    else:
+        index = StreetIndex.build(download_ways(lat, lon, radius_m))
+        if path:
+            os.makedirs(STREET_INDEX_DIR, exist_ok=True)
+            index.save(path)
+
+    _street_indexes.set(key, index)
+    return index
@@ -1,9 +1,29 @@
+import base64
 from datetime import datetime, timedelta, date
 from astral import Observer, sun
 from typing import Dict, Any
 from zoneinfo import ZoneInfo
-from utils import get_horizon_azimuth, get_timezone_from_coordinates
-from config import MATCH_THRESHOLD_DEG
+import numpy as np
+from utils import get_horizon_azimuths, get_timezone_from_coordinates
+from config import MATCH_THRESHOLD_DEG, SOLAR_ENGINE, HORIZON_SOLVER, AZIMUTH_CACHE_MAX_ENTRIES, AZIMUTH_CACHE_DB
+from cache import LRUCache, SingleFlight
+
+
+# Annual azimuth curves, keyed on (lat, lon, target altitude, time of day, start date, engine, solver).
+# JSON turns the int day indexes into strings on the way to disk, so turn them back.
+azimuth_cache = LRUCache(
+    "azimuth_curves",
+    max_entries=AZIMUTH_CACHE_MAX_ENTRIES,
+    db_path=AZIMUTH_CACHE_DB,
+    decode=lambda curve: {int(day_index): day for day_index, day in curve.items()},
+)
+azimuth_flight = SingleFlight("azimuth_curves")
+
+# Response formats for a year of sun azimuths (see pack_sun_azimuths)
+SUN_ANGLE_FORMATS = ("objects", "columnar", "binary")
+
+# Little-endian column types of the binary format
+_COLUMN_DTYPES = {"days": "<u2", "offsets": "<i4", "azimuths": "<f4"}
 
 
 def calculate_sun_azimuths_for_year(
@@ -12,6 +32,8 @@ def calculate_sun_azimuths_for_year(
     start_date: date = None,
     target_altitude_deg: float = 0.5,
     time_of_day: str = "sunset",
+    engine: str = SOLAR_ENGINE,
+    solver: str = HORIZON_SOLVER,
 ) -> Dict[int, Dict[str, Any]]:
     """
     Calculate sun azimuth at target altitude for every day of the year.
@@ -22,56 +44,99 @@ def calculate_sun_azimuths_for_year(
         start_date: Start date for calculations (default: January 1 of specified year)
         target_altitude_deg: Sun altitude in degrees (default: 0.5)
         time_of_day: Either "sunrise" or "sunset" (default: "sunset")
+        engine: "numpy" (all days in one vectorized pass) or "astral"
+        solver: Horizon crossing solver passed to get_horizon_azimuths
         
     Returns:
         Dictionary with day index (0-based) as keys and dictionaries with 'date' and 'azimuth' as values
+
+    Results are cached (see azimuth_cache), so repeat lookups for the same rounded location are cheap.
+    The returned dict is the cached one, shared with other callers, so it must not be modified.
     """
     # Round coordinates to 3 decimal places
     lat = round(lat, 3)
     lon = round(lon, 3)
-    
+
+    if start_date is None:
+        # Start with January 1st of the current year
+        start_date = date(datetime.now(ZoneInfo("UTC")).year, 1, 1)
+
+    cache_key = (lat, lon, target_altitude_deg, time_of_day, start_date.isoformat(), engine, solver)
+    cached = azimuth_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Concurrent requests for the same curve wait for one calculation
+    return azimuth_flight.do(cache_key, _calculate_sun_azimuths, cache_key, lat, lon, start_date, target_altitude_deg, time_of_day, engine, solver)
+
+
+def _calculate_sun_azimuths(cache_key, lat, lon, start_date, target_altitude_deg, time_of_day, engine, solver):
     # Create observer for the location
     obs = Observer(lat, lon)
     
     # Get timezone for the location (needed for astral library)
     tz = get_timezone_from_coordinates(lat, lon)
     
-    # Determine the start date
-    if start_date is not None:
-        # Use the provided start date
-        start_datetime = datetime.combine(start_date, datetime.min.time(), tzinfo=tz)
-    else:
-        # Start with January 1st of the current year
-        year = datetime.now(ZoneInfo("UTC")).year
-        start_datetime = datetime(year, 1, 1, tzinfo=tz)
+    start_datetime = datetime.combine(start_date, datetime.min.time(), tzinfo=tz)
     
     results = {}
-    
-    for day_index in range(365):  # Calculate for all 365 days of the year
-        current_date = start_datetime + timedelta(days=day_index)
-        
-        try:
-            # Use the existing get_horizon_azimuth function from utils.py
-            azimuth, exact_time = get_horizon_azimuth(
-                tz, obs, current_date, target_altitude_deg, time_of_day=time_of_day
-            )
-            
-            if azimuth is not None and exact_time is not None:
-                # Convert to UTC for consistent results
-                exact_time_utc = exact_time.astimezone(ZoneInfo("UTC"))
-                
-                # Store by day index (0-based)
-                results[day_index] = {
-                    'date': exact_time_utc.isoformat(),
-                    'azimuth': round(azimuth, 2)
-                }
-                
-        except (ValueError, AttributeError) as e:
-            print(f"Could not get azimuth for {current_date.date()}: {e}")
-            continue
-        except Exception as e:
-            print(f"Unexpected error for {current_date.date()}: {e}")
-            continue
-    
+
+    dates = [start_datetime + timedelta(days=day_index) for day_index in range(365)]  # Calculate for all 365 days of the year
+    horizon = get_horizon_azimuths(
+        tz, obs, dates, target_altitude_deg, time_of_day=time_of_day, engine=engine, solver=solver
+    )
+
+    for day_index, (azimuth, exact_time) in enumerate(horizon):
+        if azimuth is not None and exact_time is not None:
+            # Convert to UTC for consistent results
+            exact_time_utc = exact_time.astimezone(ZoneInfo("UTC"))
+
+            # Store by day index (0-based)
+            results[day_index] = {
+                'date': exact_time_utc.isoformat(),
+                'azimuth': round(azimuth, 2)
+            }
+
+    azimuth_cache.set(cache_key, results)
     return results
 
+
+
+def pack_sun_azimuths(results: Dict[int, Dict[str, Any]], start_date: date, fmt: str = "columnar") -> Dict[str, Any]:
+    """
+    Convert the output of calculate_sun_azimuths_for_year to a columnar layout.
+
+    Instead of one object with an ISO timestamp per day, the columns are:
+        days: day index (0-based) of each entry, ascending
+        offsets: seconds from start_epoch (UTC midnight of start_date) to the exact time
+        azimuths: azimuth in degrees
+
+    Args:
+        results: Day index -> {'date', 'azimuth'} as returned by calculate_sun_azimuths_for_year
+        start_date: Start date the results were calculated from
+        fmt: "columnar" (JSON arrays) or "binary" (each column base64 encoded,
+            little-endian uint16 days, int32 offsets and float32 azimuths,
+            ready to be wrapped in typed arrays)
+
+    Returns:
+        Dictionary with 'format', 'start_epoch', 'count' and the three columns
+    """
+    if fmt not in ("columnar", "binary"):
+        raise ValueError(f"Unknown sun angle format: {fmt}")
+
+    start_epoch = int(datetime.combine(start_date, datetime.min.time(), tzinfo=ZoneInfo("UTC")).timestamp())
+    days = sorted(results)
+    offsets = [round(datetime.fromisoformat(results[day]['date']).timestamp()) - start_epoch for day in days]
+    azimuths = [results[day]['azimuth'] for day in days]
+
+    packed = {
+        'format': fmt,
+        'start_epoch': start_epoch,
+        'count': len(days),
+    }
+    if fmt == "columnar":
+        packed.update(days=days, offsets=offsets, azimuths=azimuths)
+    else:
+        for name, column in (("days", days), ("offsets", offsets), ("azimuths", azimuths)):
+            packed[name] = base64.b64encode(np.asarray(column, dtype=_COLUMN_DTYPES[name]).tobytes()).decode("ascii")
+    return packed
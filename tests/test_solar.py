@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from solar import find_altitude_crossing
+
+
+def test_find_altitude_crossing_outside_window_is_nan():
+    seed = np.array([1e9, 1e9])
+    crossing = seed - np.array([120 * 60, 10 * 60])  # 120 and 10 minutes before sunset
+
+    def elevation(t):
+        return 0.5 - 0.004 * (t - crossing)
+
+    minutes = (find_altitude_crossing(elevation, seed, 0.5, 60, "sunset") - seed) / 60
+    assert np.isnan(minutes[0])
+    assert abs(minutes[1] + 10) < 0.01
@@ -0,0 +1,124 @@
+"""
+Shared timezone resolution.
+
+TimezoneFinder loads its polygon data when it's constructed, so building one
+per lookup (once per search and per azimuth curve) is slow. TimezoneResolver
+keeps one for the life of the process and memoizes answers on a grid of
+TIMEZONE_CELL_DEG cells: the first lookup in a cell tests its corners and
+center, and if they are all in the same zone (true of nearly every cell) the
+whole cell resolves to it from then on without a polygon test. Only cells on
+a border fall back to the exact polygon test for each point. A zone that is
+smaller than a cell and touches none of the sampled points can be missed.
+
+ZoneInfo instances are shared too, so every lookup in a zone returns the same
+object. The resolver is safe to share across threads. With TIMEZONE_CACHE_DB,
+resolved cells are also written to SQLite, so they survive restarts and are
+shared by the server's worker processes (see serving.py).
+"""
+import math
+import threading
+from zoneinfo import ZoneInfo
+
+from cache import LRUCache
+from config import TIMEZONE_CELL_DEG, TIMEZONE_CACHE_MAX_CELLS, TIMEZONE_CACHE_DB
+
+# Marks a cell with more than one zone in the cache
+_BORDER = ""
+
+
+class TimezoneResolver:
+    """
+    Long-lived, grid-memoized timezone lookups.
+
+    Args:
+        cell_deg: Size of the memoized grid cells in degrees
+        max_cells: Number of cells kept in the memo (least recently used are evicted)
+        db_path: Optional path to a SQLite file the memo is also kept in
+    """
+
+    def __init__(self, cell_deg=TIMEZONE_CELL_DEG, max_cells=TIMEZONE_CACHE_MAX_CELLS, db_path=TIMEZONE_CACHE_DB):
+        self.cell_deg = cell_deg
+        self._cells = LRUCache("timezone_cells", max_entries=max_cells, db_path=db_path)
+        self._zones = {}
+        self._finder = None
+        self._finder_lock = threading.Lock()
+        self.exact_lookups = 0
+
+    def _load_finder(self, in_memory=False):
+        if self._finder is None:
+            # Imported on first use; slow to import and load (see scripts/benchmark_startup.py)
+            from timezonefinder import TimezoneFinder
+
+            self._finder = TimezoneFinder(in_memory=in_memory)
+
+    def preload(self):
+        """
+        Load the timezone polygons into memory and the memoized cells from disk, e.g. before forking workers.
+        """
+        with self._finder_lock:
+            self._load_finder(in_memory=True)
+        self._cells.preload()
+
+    def _exact_name(self, lat, lon):
+        """
+        Zone name from the polygon test. TimezoneFinder isn't thread-safe, so calls are serialized.
+        """
+        with self._finder_lock:
+            self._load_finder()
+            self.exact_lookups += 1
+            name = self._finder.timezone_at(lat=lat, lng=lon)
+        if name is None:
+            # Open ocean: the nautical zone, e.g. Etc/GMT+5 for UTC-5
+            name = f"Etc/GMT{-round(lon / 15):+d}"
+        return name
+
+    def zone(self, name) -> ZoneInfo:
+        """
+        The shared ZoneInfo for a zone name.
+        """
+        tz = self._zones.get(name)
+        if tz is None:
+            tz = self._zones.setdefault(name, ZoneInfo(name))
+        return tz
+
+    def timezone_name_at(self, lat, lon) -> str:
+        row = math.floor(lat / self.cell_deg)
+        col = math.floor(lon / self.cell_deg)
+        name = self._cells.get((row, col))
+
+        if name is None:
+            south, west = row * self.cell_deg, col * self.cell_deg
+            north, east = south + self.cell_deg, west + self.cell_deg
+            samples = [(south, west), (south, east), (north, west), (north, east), ((south + north) / 2, (west + east) / 2)]
+            names = {self._exact_name(min(max(y, -90.0), 90.0), min(max(x, -180.0), 180.0)) for y, x in samples}
+            name = names.pop() if len(names) == 1 else _BORDER
+            self._cells.set((row, col), name)
+
+        if name == _BORDER:
+            return self._exact_name(lat, lon)
+        return name
+
+    def timezone_at(self, lat, lon) -> ZoneInfo:
+        """
+        Timezone for a latitude and longitude.
+        """
+        return self.zone(self.timezone_name_at(lat, lon))
+
+    def stats(self):
+        return {**self._cells.stats(), 'zones': len(self._zones), 'exact_lookups': self.exact_lookups}
+
+
+_timezone_resolver = None
+_timezone_resolver_lock = threading.Lock()
+
+
+def get_timezone_resolver():
+    """
+    The shared TimezoneResolver.
+    """
+    global _timezone_resolver
+    if _timezone_resolver is None:
+        with _timezone_resolver_lock:
+            if _timezone_resolver is None:
+                _timezone_resolver = TimezoneResolver()
+    return _timezone_resolver
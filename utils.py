@@ -1,19 +1,38 @@
-from geopy.geocoders import Nominatim
 from astral import Observer, sun
-import math
 from datetime import timedelta
-import osmnx as ox
 from zoneinfo import ZoneInfo
-from timezonefinder import TimezoneFinder
 from datetime import timedelta
 import numpy as np
 from config import (
     MATCH_THRESHOLD_DEG,
+    HENGE_MERGE_DAYS,
     ROAD_SEARCH_RADIUS_M,
     TARGET_ALTITUDE_DEG,
     SEARCH_WINDOW_MINUTES,
+    SOLAR_ENGINE,
+    HORIZON_SOLVER,
+    GEOCODE_CACHE_MAX_ENTRIES,
+    GEOCODE_CACHE_DB,
+    GEOCODE_CACHE_TTL_SECONDS,
+    GEOCODE_NEGATIVE_TTL_SECONDS,
+    GEOCODE_MIN_INTERVAL_SECONDS,
+    GEOCODE_RATE_FILE,
+    REVERSE_GEOCODE_PRECISION,
 )
 from datetime import datetime, date
+from contextlib import contextmanager
+import threading
+import os
+import re
+import time
+from cache import LRUCache, SingleFlight
+from metrics import timed, count
+from timezones import get_timezone_resolver
+from solar import horizon_azimuths, find_altitude_crossing, to_local_date, epoch_to_datetime
+
+# geopy, osmnx and timezonefinder are slow to import (osmnx alone pulls in
+# geopandas, networkx and matplotlib), so they're imported on first use to keep
+# startup fast. See scripts/benchmark_startup.py.
 
 
 class GeocodingError(Exception):
@@ -22,13 +41,144 @@ class GeocodingError(Exception):
     pass
 
 
+# Active ephemeris counters for the current thread (see count_ephemeris_evaluations)
+_ephemeris_counters = threading.local()
+
+
+@contextmanager
+def count_ephemeris_evaluations():
+    """
+    Count the daily sun azimuth calculations (get_horizon_azimuth/get_horizon_azimuths days) made in this block.
+
+    Counters are per thread and can be nested.
+
+    Yields:
+        dict with an 'evaluations' count
+    """
+    counter = {'evaluations': 0}
+    stack = getattr(_ephemeris_counters, 'stack', None)
+    if stack is None:
+        stack = _ephemeris_counters.stack = []
+    stack.append(counter)
+    try:
+        yield counter
+    finally:
+        stack.remove(counter)
+
+
+def _record_ephemeris_evaluations(n):
+    count("ephemeris_evaluations", n)
+    for counter in getattr(_ephemeris_counters, 'stack', ()):
+        counter['evaluations'] += n
+
+
+# Geocoding results (forward, by normalized address, and reverse, by rounded coordinates).
+# Failures are cached separately, for a shorter time.
+geocode_cache = LRUCache(
+    "geocode",
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+    db_path=GEOCODE_CACHE_DB,
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+)
+geocode_failure_cache = LRUCache(
+    "geocode_failures",
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+    db_path=GEOCODE_CACHE_DB,
+    ttl_seconds=GEOCODE_NEGATIVE_TTL_SECONDS,
+)
+
+# Concurrent identical lookups share one call (see cache.SingleFlight)
+geocode_flight = SingleFlight("geocode")
+road_bearing_flight = SingleFlight("road_bearing")
+
+_geolocator = None
+
+
+def _get_geolocator():
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+
+        _geolocator = Nominatim(
+            user_agent="HengeFinder", timeout=10
+        )  # longer timeout is needed for some addresses
+    return _geolocator
+
+
+# Time of this process's last Nominatim request (with GEOCODE_RATE_FILE unset)
+_last_geocode_request = 0.0
+_geocode_rate_lock = threading.Lock()
+
+
+def _wait_for_geocoding_turn():
+    """
+    Wait until GEOCODE_MIN_INTERVAL_SECONDS have passed since the last Nominatim request, and claim the next turn.
+
+    Nominatim allows one request per second per client, and the server workers, batch workers
+    and job threads all geocode. So the time of the last request is kept in GEOCODE_RATE_FILE,
+    locked while a process waits for its turn.
+    """
+    global _last_geocode_request
+    with _geocode_rate_lock, timed("geocode_wait"):
+        if GEOCODE_RATE_FILE is None:
+            time.sleep(max(_last_geocode_request + GEOCODE_MIN_INTERVAL_SECONDS - time.time(), 0))
+            _last_geocode_request = time.time()
+            return
+
+        import fcntl
+
+        if os.path.dirname(GEOCODE_RATE_FILE):
+            os.makedirs(os.path.dirname(GEOCODE_RATE_FILE), exist_ok=True)
+        with open(GEOCODE_RATE_FILE, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+            f.seek(0)
+            try:
+                last = float(f.read() or 0)
+            except ValueError:
+                last = 0.0
+            time.sleep(max(last + GEOCODE_MIN_INTERVAL_SECONDS - time.time(), 0))
+            f.truncate(0)
+            f.write(repr(time.time()))
+
+
+def normalize_address(address):
+    """
+    Normalize an address for use as a cache key (case, whitespace and comma spacing).
+    """
+    address = " ".join(address.lower().split())
+    return re.sub(r"\s*,\s*", ", ", address).strip(" ,")
+
+
+@timed("geocode")
 def get_location(address):
-    geolocator = Nominatim(
-        user_agent="HengeFinder", timeout=10
-    )  # longer timeout is needed for some addresses
-    location = geolocator.geocode(address)
+    key = ("forward", normalize_address(address))
+    return geocode_flight.do(key, _get_location, key, address)
+
+
+def _get_location(key, address):
+    failure = geocode_failure_cache.get(key)
+    if failure is not None:
+        raise GeocodingError(failure)
+
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        from geopy.location import Location
+
+        return Location(cached["address"], (cached["latitude"], cached["longitude"]), cached["raw"])
+
+    _wait_for_geocoding_turn()
+    location = _get_geolocator().geocode(address)
     if location is None:
-        raise GeocodingError(f"Could not find coordinates for address: {address}")
+        message = f"Could not find coordinates for address: {address}"
+        geocode_failure_cache.set(key, message)
+        raise GeocodingError(message)
+
+    geocode_cache.set(key, {
+        "address": location.address,
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "raw": location.raw,
+    })
     return location
 
 
@@ -48,17 +198,34 @@ def get_standardized_address(location):
     return location.address
 
 
+@timed("reverse_geocode")
 def get_concise_address(location):
     """
     Get a concise version of address
     """
-    geolocator = Nominatim(
-        user_agent="HengeFinder", timeout=10
-    )  # longer timeout is needed for some addresses
+    key = (
+        "reverse",
+        round(location.latitude, REVERSE_GEOCODE_PRECISION),
+        round(location.longitude, REVERSE_GEOCODE_PRECISION),
+    )
+    return geocode_flight.do(key, _get_concise_address, key, location)
+
+
+def _get_concise_address(key, location):
+    failure = geocode_failure_cache.get(key)
+    if failure is not None:
+        raise GeocodingError(failure)
 
-    rev = geolocator.reverse((location.latitude, location.longitude), addressdetails=True)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached
+
+    _wait_for_geocoding_turn()
+    rev = _get_geolocator().reverse((location.latitude, location.longitude), addressdetails=True)
     if rev is None:
-        raise GeocodingError(f"Could not reverse-geocode: {location.address}")
+        message = f"Could not reverse-geocode: {location.address}"
+        geocode_failure_cache.set(key, message)
+        raise GeocodingError(message)
     
     addr = rev.raw.get("address", {})
 
@@ -81,6 +248,7 @@ def get_concise_address(location):
     parts = [street, city, state_post, country]
     concise = ", ".join(filter(None, parts))
 
+    geocode_cache.set(key, concise)
     return concise
 
 
@@ -111,13 +279,14 @@ def check_latitude(lat, max_lat=60):
     return True
 
 
+@timed("timezone")
 def get_timezone_from_coordinates(lat, lon):
     """
     Get the timezone for a given latitude and longitude.
+
+    Uses the shared, grid-memoized resolver (see timezones.py).
     """
-    tf = TimezoneFinder()
-    timezone_name = tf.timezone_at(lat=lat, lng=lon)
-    return ZoneInfo(timezone_name)
+    return get_timezone_resolver().timezone_at(lat, lon)
 
 
 def check_match(azimuth, road_bearing, match_threshold_deg=MATCH_THRESHOLD_DEG):
@@ -132,11 +301,29 @@ def check_match(azimuth, road_bearing, match_threshold_deg=MATCH_THRESHOLD_DEG):
         return False
 
 
+@timed("road_bearing")
 def get_road_bearing(lat, lon, dist=ROAD_SEARCH_RADIUS_M, network_type="drive"):
     """
     Return the street‐bearing (degrees clockwise from North) at the given address
     by finding the nearest OSMnx edge and calculating bearing.
+
+    Uses the local road tiles (see road_store.py) when they cover the point,
+    and only downloads the network around the point otherwise.
     """
+    key = (round(lat, REVERSE_GEOCODE_PRECISION), round(lon, REVERSE_GEOCODE_PRECISION), dist, network_type)
+    return road_bearing_flight.do(key, _get_road_bearing, lat, lon, dist, network_type)
+
+
+def _get_road_bearing(lat, lon, dist, network_type):
+    # imported here because road_store uses calculate_bearing from this module
+    from road_store import get_road_store
+
+    store = get_road_store()
+    if store is not None and store.covers(lat, lon, network_type):
+        bearing, _, _ = store.nearest_edge(lat, lon, dist)
+        return normalize_bearing_to_180_360(bearing)
+
+    import osmnx as ox
 
     # get a network around the point
     # we use truncate_by_edge=True to make sure we get all edges within the distance
@@ -153,25 +340,36 @@ def get_road_bearing(lat, lon, dist=ROAD_SEARCH_RADIUS_M, network_type="drive"):
     lat_2 = G.nodes[v]["y"]
     lon_2 = G.nodes[v]["x"]
 
-    # We now have two points near the address, given by coordinates (lat, lon).
+    bearing = float(calculate_bearing(lat_1, lon_1, lat_2, lon_2))
+
+    # put in 180-360 range, since the sun sets in the west (and if a road bearing is, for e.g, 90, it's fine to say 270)
+    bearing = normalize_bearing_to_180_360(bearing)
+
+    return bearing
+
+
+def calculate_bearing(lat_1, lon_1, lat_2, lon_2):
+    """
+    Bearing (degrees clockwise from North, 0-360) from point 1 to point 2.
+
+    Works on scalars or NumPy arrays of coordinates.
+    """
+    # We have two points near the address, given by coordinates (lat, lon).
     # In theory, we could use basic trig, using the difference in latitudes and longitudes and use the arctan2 function to calculate the bearing.
     # But the earth is not flat, so we have to scale the difference in longitudes by the cosine of the mean latitude (longitude lines converge at the poles).
     # Latitude lines are parallel, so we can just use the difference in latitudes.
 
     delta_y = lat_2 - lat_1
-    mean_lat = math.radians((lat_1 + lat_2) / 2)
-    delta_x = (lon_2 - lon_1) * math.cos(mean_lat)
+    mean_lat = np.radians((lat_1 + lat_2) / 2)
+    delta_x = (lon_2 - lon_1) * np.cos(mean_lat)
 
     # calculate angle in radians
-    bearing_rad = math.atan2(delta_x, delta_y)
+    bearing_rad = np.arctan2(delta_x, delta_y)
 
     # convert to degrees and normalize to 0-360
-    bearing_deg = math.degrees(bearing_rad)
+    bearing_deg = np.degrees(bearing_rad)
     bearing = (bearing_deg + 360) % 360
 
-    # put in 180-360 range, since the sun sets in the west (and if a road bearing is, for e.g, 90, it's fine to say 270)
-    bearing = normalize_bearing_to_180_360(bearing)
-
     return bearing
 
 
@@ -186,6 +384,73 @@ def normalize_bearing_to_180_360(bearing: float) -> float:
     return bearing
 
 
+def find_alignment_days(
+    azimuths,
+    road_bearing: float,
+    match_threshold_deg: float = MATCH_THRESHOLD_DEG,
+    merge_days: int = HENGE_MERGE_DAYS,
+) -> list:
+    """
+    Find every day in a daily azimuth series on which the sun aligns with the road.
+
+    A henge is either a crossing of the road bearing (the signed difference changes sign
+    between two consecutive days; linear interpolation picks the closer of the two days) or a
+    run of days within match_threshold_deg of it (e.g. the sun turning around near the road
+    bearing at a solstice; the closest day of the run is picked).
+
+    Alignments with at most merge_days days between them are one henge (the closest day is
+    picked): near a solstice the azimuth barely moves from day to day, and with whole-minute
+    sunset times (HORIZON_SOLVER="binary") it wobbles in and out of the threshold.
+
+    Args:
+        azimuths: Daily azimuths in degrees (NaN where there is no value)
+        road_bearing: Road's bearing angle in degrees
+        match_threshold_deg: How close (in degrees) the sun must be to count as aligned without crossing
+        merge_days: Most days between two alignments that are counted as one henge
+
+    Returns:
+        list: Sorted indexes into azimuths of the henge days
+    """
+    diff = (road_bearing - np.asarray(azimuths, dtype=np.float64) + 180) % 360 - 180
+    valid = np.isfinite(diff)
+    near = valid & (np.abs(diff) < match_threshold_deg)
+
+    alignments = []  # (first day, last day, henge day)
+
+    # Runs of days within the threshold: keep the closest day of each run
+    i = 0
+    while i < len(diff):
+        if near[i]:
+            run_end = i
+            while run_end + 1 < len(diff) and near[run_end + 1]:
+                run_end += 1
+            alignments.append((i, run_end, i + int(np.argmin(np.abs(diff[i:run_end + 1])))))
+            i = run_end + 1
+        else:
+            i += 1
+
+    # Sign changes of the difference (ignoring the jump on the opposite side of the compass)
+    a, b = diff[:-1], diff[1:]
+    crossings = valid[:-1] & valid[1:] & ((a >= 0) != (b >= 0)) & (np.abs(a - b) < 90)
+    for i in np.flatnonzero(crossings):
+        if near[i] or near[i + 1]:
+            continue  # already covered by a run
+        fraction = a[i] / (a[i] - b[i])  # where between day i and i + 1 the bearing is crossed
+        alignments.append((int(i), int(i) + 1, int(i) if fraction < 0.5 else int(i) + 1))
+
+    days = []
+    end = None
+    for first, last, day in sorted(alignments):
+        if days and first - end - 1 <= merge_days:
+            if abs(diff[day]) < abs(diff[days[-1]]):
+                days[-1] = day
+            end = max(end, last)
+        else:
+            days.append(day)
+            end = last
+    return days
+
+
 def get_closest_alignment_direction(
     azimuth: float, road_bearing: float
 ) -> tuple[float, int]:
@@ -220,12 +485,15 @@ def get_horizon_azimuth(
     target_altitude_deg: float = TARGET_ALTITUDE_DEG,
     search_window_minutes: int = SEARCH_WINDOW_MINUTES,
     time_of_day: str = "sunset",
+    engine: str = SOLAR_ENGINE,
+    solver: str = HORIZON_SOLVER,
 ):
     """
     Find the sun's azimuth when it reaches a specific altitude above the horizon.
 
     Uses binary search to find the exact time when the sun is at the target altitude
-    within the search window before sunset or after sunrise.
+    within the search window before sunset or after sunrise. With solver="secant",
+    the exact (sub-second) crossing is found instead, seeded from the sunrise/sunset time.
 
     Args:
         tz: Timezone for the location
@@ -234,10 +502,19 @@ def get_horizon_azimuth(
         target_altitude_deg: Target altitude in degrees
         search_window_minutes: Search window in minutes
         time_of_day: Either "sunrise" or "sunset"
+        engine: "numpy" (vectorized solar module) or "astral" (reference implementation)
+        solver: "binary" (whole-minute search) or "secant" (sub-second root finding)
 
     Returns:
         tuple: (azimuth, exact_time)
     """
+    if engine == "numpy":
+        return get_horizon_azimuths(
+            tz, obs, [date], target_altitude_deg, search_window_minutes, time_of_day, engine, solver
+        )[0]
+
+    _record_ephemeris_evaluations(1)
+
     try:
         # Get sunrise/sunset time for date/location
         # If date has a time zone (eg from server), convert to the target timezone.
@@ -261,6 +538,11 @@ def get_horizon_azimuth(
         print(e)
         return None, None
 
+    if solver == "secant":
+        return _secant_search(
+            search_window_minutes, target_altitude_deg, reference_time, obs, time_of_day
+        )
+
     if time_of_day == "sunrise":
         return _binary_search(
             -1, search_window_minutes, target_altitude_deg, reference_time, obs, "sunrise"
@@ -271,6 +553,129 @@ def get_horizon_azimuth(
         )
 
 
+def get_horizon_azimuths(
+    tz: ZoneInfo,
+    obs: Observer,
+    dates: list,
+    target_altitude_deg: float = TARGET_ALTITUDE_DEG,
+    search_window_minutes: int = SEARCH_WINDOW_MINUTES,
+    time_of_day: str = "sunset",
+    engine: str = SOLAR_ENGINE,
+    solver: str = HORIZON_SOLVER,
+):
+    """
+    Batch version of get_horizon_azimuth for a list of dates.
+
+    With the "numpy" engine all dates are evaluated in one vectorized pass;
+    with "astral" this just loops over get_horizon_azimuth.
+
+    Returns:
+        list of (azimuth, exact_time) tuples, (None, None) where it could not be calculated
+    """
+    if engine != "numpy":
+        return [
+            get_horizon_azimuth(
+                tz, obs, d, target_altitude_deg, search_window_minutes, time_of_day, engine, solver
+            )
+            for d in dates
+        ]
+
+    local_dates = [to_local_date(d, tz) for d in dates]
+    _record_ephemeris_evaluations(len(local_dates))
+    with timed("ephemeris"):
+        azimuths, exact_times = horizon_azimuths(
+            obs.latitude,
+            obs.longitude,
+            local_dates,
+            tz,
+            target_altitude_deg,
+            search_window_minutes,
+            time_of_day,
+            solver,
+        )
+
+    return _horizon_results(local_dates, azimuths, exact_times, tz, time_of_day)
+
+
+def _horizon_results(local_dates, azimuths, exact_times, tz, time_of_day):
+    results = []
+    for local_date, az, t in zip(local_dates, azimuths, exact_times):
+        if np.isnan(t):
+            print(f"Could not get azimuth for {local_date}: no {time_of_day} on this day")
+            results.append((None, None))
+        else:
+            results.append((float(az), epoch_to_datetime(t, tz)))
+    return results
+
+
+def get_sunrise_sunset_azimuths(
+    tz: ZoneInfo,
+    obs: Observer,
+    dates: list,
+    target_altitude_deg: float = TARGET_ALTITUDE_DEG,
+    search_window_minutes: int = SEARCH_WINDOW_MINUTES,
+    engine: str = SOLAR_ENGINE,
+    solver: str = HORIZON_SOLVER,
+):
+    """
+    get_horizon_azimuths for both sunrise and sunset.
+
+    With the "numpy" engine both are calculated in the same vectorized passes, sharing the
+    per-day quantities (dates, transit ephemeris) instead of computing them twice.
+
+    Returns:
+        tuple (sunrises, sunsets): lists of (azimuth, exact_time) tuples, as get_horizon_azimuths returns
+    """
+    if engine != "numpy":
+        return tuple(
+            get_horizon_azimuths(tz, obs, dates, target_altitude_deg, search_window_minutes, time_of_day, engine, solver)
+            for time_of_day in ("sunrise", "sunset")
+        )
+
+    local_dates = [to_local_date(d, tz) for d in dates]
+    _record_ephemeris_evaluations(2 * len(local_dates))
+    with timed("ephemeris"):
+        azimuths, exact_times = horizon_azimuths(
+            obs.latitude,
+            obs.longitude,
+            local_dates,
+            tz,
+            target_altitude_deg,
+            search_window_minutes,
+            "both",
+            solver,
+        )
+
+    return tuple(
+        _horizon_results(local_dates, azimuths[row], exact_times[row], tz, time_of_day)
+        for row, time_of_day in enumerate(("sunrise", "sunset"))
+    )
+
+
+@timed("ephemeris")
+def _secant_search(search_window_minutes, target_altitude_deg, base_time, obs, time_of_day="sunset"):
+    """
+    Find the exact time the sun crosses target_altitude_deg using astral's elevation.
+
+    Secant iteration seeded from the sunrise/sunset time (see solar.find_altitude_crossing).
+    """
+    tz = base_time.tzinfo
+
+    def elevation(epochs):
+        return np.array([sun.elevation(obs, datetime.fromtimestamp(t, tz)) for t in epochs])
+
+    crossing = find_altitude_crossing(
+        elevation, [base_time.timestamp()], target_altitude_deg, search_window_minutes, time_of_day
+    )[0]
+    if np.isnan(crossing):
+        print(f"Sun does not reach {target_altitude_deg} degrees near {time_of_day} on {base_time.date()}")
+        return None, None
+
+    exact_time = datetime.fromtimestamp(crossing, tz)
+    return sun.azimuth(obs, exact_time), exact_time
+
+
+@timed("ephemeris")
 def _binary_search(start, end, target_altitude_deg, base_time, obs, time_of_day="sunset"):
     """
     Modified binary search to find the sun's azimuth at a critical moment.